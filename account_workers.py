@@ -0,0 +1,122 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import binance_ws
+import config
+import settings
+from shared_prices import SharedPriceTable
+
+logger = logging.getLogger(__name__)
+
+# Delta product symbol the Binance BTCUSDT trade feed is published under
+FEED_SYMBOL = "BTCUSD"
+
+
+def shard_accounts(accounts, workers):
+    """Split ``accounts`` round-robin into at most ``workers`` non-empty shards."""
+    shards = [[] for _ in range(max(1, min(workers, len(accounts))))]
+    for i, account in enumerate(accounts):
+        shards[i % len(shards)].append(account)
+    return shards
+
+
+def worker_log_file(name):
+    root, ext = os.path.splitext(config.LOG_FILE)
+    return "%s.%s%s" % (root, name, ext)
+
+
+def worker_metrics_port(index):
+    """Metrics port of worker ``index``: the ports after ``config.METRICS_PORT``, or 0 if disabled."""
+    return config.METRICS_PORT + 1 + index if config.METRICS_PORT else 0
+
+
+def run_worker(name, table_name, accounts, metrics_port=0):
+    """
+    Entry point of an account worker process.
+
+    Runs a ``TradingBot`` and a ``ProfitTrailing`` loop for each account in
+    ``accounts``, all reading live prices from the shared table published by
+    the parent instead of opening their own market-data connections. The
+    worker's own metrics are served on ``metrics_port`` (0 disables them).
+    """
+    from logger import setup_logging
+    import metrics
+    import price_service
+    from profit_trailing import ProfitTrailing
+    from signal_processor import TradingBot
+
+    setup_logging(worker_log_file(name))
+    settings.ConfigWatcher().start()
+    if metrics_port:
+        metrics.start_http_server(metrics_port, config.METRICS_HOST)
+    table = SharedPriceTable.attach(table_name)
+    price_service.set_feed(table.read)
+    logger.info("Worker %s (pid %d) starting accounts %s", name, os.getpid(), accounts)
+
+    for account in accounts:
+        trailing = ProfitTrailing(check_interval=1, account=account,
+                                  price_source=lambda: table.price(FEED_SYMBOL, config.PRICE_FEED_MAX_AGE))
+        threading.Thread(target=trailing.track, name="trailing-%s" % account, daemon=True).start()
+        TradingBot(account).start()
+
+    threading.Event().wait()
+
+
+class AccountSupervisor:
+    """
+    Runs the market-data feed once and fans accounts out to worker processes.
+
+    The Binance feed runs in this process and every trade is written to a
+    ``SharedPriceTable``; workers are spawned (not forked, so no threads or
+    locks are inherited) with their shard of the configured accounts and are
+    restarted if they exit.
+    """
+
+    def __init__(self, accounts=None, workers=None):
+        self.accounts = list(accounts or settings.current().accounts)
+        self.shards = shard_accounts(self.accounts, workers or config.ACCOUNT_WORKERS)
+        self.table = SharedPriceTable.create()
+        self.context = multiprocessing.get_context("spawn")
+        self.processes = {}
+
+    def _publish(self, price, timestamp):
+        self.table.write(FEED_SYMBOL, price, timestamp)
+
+    def _spawn(self, index):
+        name = "worker-%d" % index
+        process = self.context.Process(
+            target=run_worker, args=(name, self.table.name, self.shards[index], worker_metrics_port(index)),
+            name=name, daemon=True
+        )
+        process.start()
+        self.processes[index] = process
+        logger.info("Started %s (pid %d) for accounts %s", name, process.pid, self.shards[index])
+
+    def start(self):
+        binance_ws.listeners.append(self._publish)
+        binance_ws.run_in_thread()
+        for index in range(len(self.shards)):
+            self._spawn(index)
+
+    def run(self):
+        self.start()
+        try:
+            while True:
+                time.sleep(config.WORKER_RESTART_DELAY)
+                for index, process in list(self.processes.items()):
+                    if not process.is_alive():
+                        logger.error("%s exited with code %s, restarting", process.name, process.exitcode)
+                        self._spawn(index)
+        finally:
+            self.stop()
+
+    def stop(self):
+        if self._publish in binance_ws.listeners:
+            binance_ws.listeners.remove(self._publish)
+        for process in self.processes.values():
+            process.terminate()
+        for process in self.processes.values():
+            process.join(5)
+        self.table.close()
@@ -0,0 +1,212 @@
+"""
+Offline stand-ins for ccxt's Delta exchange and the Firebase client.
+
+``install()`` swaps ``ccxt.delta`` for ``FakeDelta`` and registers a no-op
+``firebase_client`` module, so the real ``DeltaExchangeClient``,
+``TradeManager``, ``ProfitTrailing`` and ``SignalProcessor`` can be built
+and driven without network access.
+
+``LocalDeltaServer`` is a keep-alive HTTP stand-in for Delta's order
+endpoint, used to compare real request paths without leaving the host.
+"""
+import collections
+import itertools
+import json
+import sys
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LAST_PRICE = 84000.0
+
+MARKETS = {
+    "BTC/USD:USD": {
+        "id": "BTCUSD",
+        "symbol": "BTC/USD:USD",
+        "precision": {"price": 0.5, "amount": 1},
+        "info": {"id": 27, "symbol": "BTCUSD", "tick_size": "0.5"},
+    },
+}
+
+
+def make_position(index, entry, size, symbol="BTCUSD"):
+    return {
+        "id": str(index),
+        "symbol": "BTC/USD:USD",
+        "contracts": size,
+        "entryPrice": entry,
+        "info": {"product_symbol": symbol, "size": str(size), "entry_price": str(entry)},
+    }
+
+
+def make_positions(count, last_price=LAST_PRICE):
+    """Positions spread from -3% to +3% around ``last_price``, alternating long/short."""
+    positions = []
+    for i in range(count):
+        entry = last_price * (0.97 + 0.06 * (i % 100) / 100)
+        size = (1 + i % 5) * (1 if i % 2 == 0 else -1)
+        positions.append(make_position(i, round(entry, 1), size))
+    return positions
+
+
+class FakeDelta:
+    has = {"fetchClosedOrders": True}
+
+    enableRateLimit = False
+    # Seconds each order/bracket call blocks, standing in for a REST round-trip
+    latency = 0.0
+
+    def __init__(self, config=None):
+        self.config = config or {}
+        self.apiKey = self.config.get("apiKey", "key")
+        self.secret = self.config.get("secret", "secret")
+        self.positions = []
+        self.open_orders = []
+        self.closed_orders = collections.deque(maxlen=100)
+        self.last_price = LAST_PRICE
+        self.calls = collections.Counter()
+        self._ids = itertools.count(1)
+
+    # ccxt request plumbing wrapped by DeltaExchangeClient._instrument_exchange
+    def fetch2(self, path, api="public", method="GET", *args, **kwargs):
+        return self.fetch(path, method)
+
+    def fetch(self, url, method="GET", headers=None, body=None):
+        return {}
+
+    def throttle(self, cost=None):
+        pass
+
+    def load_markets(self, reload=False):
+        self.calls["load_markets"] += 1
+        return MARKETS
+
+    def fetch_balance(self, params={}):
+        self.calls["fetch_balance"] += 1
+        return {"USD": {"free": 10000.0, "used": 0.0, "total": 10000.0}}
+
+    def fetch_positions(self, symbols=None, params={}):
+        self.calls["fetch_positions"] += 1
+        return self.positions
+
+    def fetch_open_orders(self, symbol=None, since=None, limit=None, params={}):
+        self.calls["fetch_open_orders"] += 1
+        return [o for o in self.open_orders if symbol is None or o["symbol"] == symbol]
+
+    def fetch_ticker(self, symbol, params={}):
+        self.calls["fetch_ticker"] += 1
+        return {"symbol": symbol, "last": self.last_price}
+
+    def fetch_tickers(self, symbols=None, params={}):
+        self.calls["fetch_tickers"] += 1
+        tickers = {}
+        for s in symbols or MARKETS:
+            market = MARKETS.get(s) or next((m for m in MARKETS.values() if m["id"] == s), None)
+            unified = market["symbol"] if market else s
+            tickers[unified] = {"symbol": unified, "last": self.last_price}
+        return tickers
+
+    def create_order(self, symbol, type, side, amount, price=None, params={}):
+        self.calls["create_order"] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        order = {
+            "id": str(next(self._ids)),
+            "symbol": symbol,
+            "type": type,
+            "side": side,
+            "amount": amount,
+            "price": price,
+            "status": "open",
+            "clientOrderId": params.get("client_order_id"),
+            "timestamp": int(time.time() * 1000),
+        }
+        if type == "limit":
+            self.open_orders.append(order)
+        else:
+            order["status"] = "closed"
+            self.closed_orders.append(order)
+        return order
+
+    def fetch_closed_orders(self, symbol=None, since=None, limit=None, params={}):
+        self.calls["fetch_closed_orders"] += 1
+        return [o for o in self.closed_orders if symbol is None or o["symbol"] == symbol][-(limit or 0):]
+
+    def cancel_order(self, id, symbol=None, params={}):
+        self.calls["cancel_order"] += 1
+        self.open_orders = [o for o in self.open_orders if o["id"] != id]
+        return {"id": id, "status": "canceled"}
+
+    def privatePutOrdersBracket(self, params):
+        self.calls["privatePutOrdersBracket"] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return {"result": params, "success": True}
+
+
+def _fake_firebase():
+    module = types.ModuleType("firebase_client")
+    module.store_order = lambda account_key, order_id, order_data: None
+    module.get_signal = lambda account_key="MAIN": None
+    module.stream_signal = lambda account_key="MAIN", callback=None: None
+    return module
+
+
+class _OrderHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    ids = itertools.count(1)
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        result = dict(request, id=next(self.ids), state="open", product_symbol="BTCUSD",
+                      created_at="2025-01-01T00:00:00Z", unfilled_size=request.get("size"))
+        body = json.dumps({"success": True, "result": result}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalDeltaServer:
+    def __init__(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _OrderHandler)
+        self.server.daemon_threads = True
+        self.url = "http://127.0.0.1:%d" % self.server.server_port
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+
+
+REAL_DELTA = None
+
+
+def real_delta(url):
+    """A real ccxt delta instance pointed at ``url`` with ``MARKETS`` preloaded."""
+    market = dict(MARKETS["BTC/USD:USD"], numericId=27, contractSize=0.001,
+                  base="BTC", quote="USD", settle="USD", baseId="BTC", quoteId="USD", settleId="USD",
+                  type="swap", spot=False, swap=True, future=False, option=False, margin=False,
+                  contract=True, linear=True, inverse=False, active=True,
+                  limits={"amount": {"min": 1, "max": None}, "price": {"min": None, "max": None},
+                          "cost": {"min": None, "max": None}, "leverage": {"min": None, "max": None}})
+    exchange = REAL_DELTA({"apiKey": "key", "secret": "secret", "enableRateLimit": False,
+                           "urls": {"api": {"public": url, "private": url}}})
+    exchange.set_markets([market])
+    return exchange
+
+
+def install():
+    global REAL_DELTA
+    import ccxt
+    import config
+    if REAL_DELTA is None:
+        REAL_DELTA = ccxt.delta
+    ccxt.delta = FakeDelta
+    config.FAST_ORDER_PATH = False
+    sys.modules["firebase_client"] = _fake_firebase()
@@ -0,0 +1,455 @@
+"""
+Offline benchmarks for the trading hot paths.
+
+    python -m benchmarks.run              # run and compare against baseline.json
+    python -m benchmarks.run --update     # rewrite baseline.json (slowest of five passes)
+    python -m benchmarks.run -k profit    # only benchmarks whose name contains "profit"
+    python -m benchmarks.run --passes 3   # best of three passes over the suite
+
+Every benchmark runs against ``benchmarks.fakes.FakeDelta``, except the
+order path ones, which send real requests to ``fakes.LocalDeltaServer``
+on localhost. Timings are
+reported as microseconds per operation (best of several repeats); the
+run exits non-zero when any benchmark is slower than its baseline by more
+than ``--tolerance``, or by more than its own tolerance for the socket-
+and thread-bound ones. A benchmark over the limit is measured once more
+before it counts as a regression. Every benchmark starts from fresh
+process-wide state (see ``isolate``), so a full run and a ``-k`` run
+measure the same thing. Baselines are machine specific, so regenerate them
+on the deploy host before relying on the comparison.
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import sys
+import time
+
+from benchmarks import fakes
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+BENCHMARKS = {}
+
+
+# Allowed slowdown for benchmarks dominated by sockets or thread scheduling
+IO_TOLERANCE = 1.0
+
+# Suite passes behind each --update. The baseline is the slowest of them: a
+# shared host drifts by a good fraction of the tolerance between runs, and
+# one unusually quiet pass would otherwise set a bar later runs cannot meet
+UPDATE_PASSES = 5
+
+
+def benchmark(name, tolerance=None):
+    """Register a benchmark; ``tolerance`` overrides ``--tolerance`` for it."""
+    def register(setup):
+        BENCHMARKS[name] = (setup, tolerance)
+        return setup
+    return register
+
+
+def measure(fn, ops, repeat=7, min_time=0.05):
+    """
+    Best microseconds per operation over ``repeat`` runs; ``fn`` performs
+    ``ops`` operations. Like ``timeit``, the garbage collector is paused
+    while timing so earlier benchmarks' garbage is not charged to this one.
+    """
+    gc.collect()
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _measure(fn, ops, repeat, min_time)
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _measure(fn, ops, repeat, min_time):
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        loops *= 2
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        samples.append((time.perf_counter() - start) / (loops * ops) * 1e6)
+    return min(samples)
+
+
+@benchmark("binance_ws.on_message")
+def bench_ws_on_message():
+    import binance_ws
+    messages = [json.dumps({"e": "aggTrade", "p": "%.1f" % (84000 + i * 0.5), "q": "0.010", "m": i % 2 == 0})
+                for i in range(1000)]
+    on_message = binance_ws.on_message
+
+    def run():
+        for message in messages:
+            on_message(None, message)
+    return run, len(messages)
+
+
+def _delta_book_messages(count, levels=500):
+    bids = [["%.1f" % (84000 - i * 0.5), str(100 + i)] for i in range(levels)]
+    asks = [["%.1f" % (84000.5 + i * 0.5), str(100 + i)] for i in range(levels)]
+    snapshot = {"type": "l2_updates", "action": "snapshot", "symbol": "BTCUSD",
+                "sequence_no": 0, "bids": bids, "asks": asks}
+    updates = []
+    for i in range(count):
+        offset = (i % 20) * 0.5
+        updates.append({"type": "l2_updates", "action": "update", "symbol": "BTCUSD", "sequence_no": i + 1,
+                        "bids": [["%.1f" % (84000 - offset), str(i % 7 * 10)]],
+                        "asks": [["%.1f" % (84000.5 + offset), str((i + 3) % 7 * 10)]]})
+    return snapshot, updates
+
+
+@benchmark("DeltaDepthStream.handle[update]")
+def bench_depth_update():
+    from orderbook import DeltaDepthStream
+    stream = DeltaDepthStream("BTCUSD")
+    snapshot, updates = _delta_book_messages(1000)
+
+    def run():
+        stream.handle(snapshot)
+        for update in updates:
+            stream.handle(update)
+    return run, len(updates)
+
+
+@benchmark("OrderBook quote read")
+def bench_book_quote():
+    from orderbook import DeltaDepthStream
+    stream = DeltaDepthStream("BTCUSD")
+    snapshot, _ = _delta_book_messages(0)
+    stream.handle(snapshot)
+    book = stream.book
+
+    def run():
+        for _ in range(1000):
+            quote = book.fresh_quote()
+            quote.spread
+            quote.microprice
+    return run, 1000
+
+
+@benchmark("ProfitCalculator.calculate_profit[10k]")
+def bench_calculate_profit():
+    from positions import PositionBook
+    from profit_trailing import ProfitCalculator
+    positions = PositionBook.from_ccxt(fakes.make_positions(10000)).positions
+    calculate = ProfitCalculator.calculate_profit
+
+    def run():
+        for position in positions:
+            calculate(position, fakes.LAST_PRICE)
+    return run, len(positions)
+
+
+@benchmark("ProfitTrailing._handle_profit_booking")
+def bench_profit_booking():
+    from profit_trailing import ProfitTrailing
+    trailing = ProfitTrailing(check_interval=1)
+    trailing.reconciler.client.exchange.positions = fakes.make_positions(1000)
+    trailing.reconciler.sync()
+    positions = trailing.tracker.get_valid_positions()
+
+    def run():
+        trailing.position_trailing_stop.clear()
+        for position in positions:
+            trailing._handle_profit_booking(position, fakes.LAST_PRICE)
+    return run, len(positions)
+
+
+@benchmark("Portfolio.evaluate[10k]")
+def bench_portfolio_evaluate():
+    from portfolio import Portfolio
+    from positions import PositionBook
+    portfolio = Portfolio()
+    book = PositionBook.from_ccxt(fakes.make_positions(10000))
+    for account in range(4):
+        portfolio.update_account("ACC%d" % account, book.positions[account::4])
+    prices = {"BTCUSD": fakes.LAST_PRICE}
+
+    def run():
+        portfolio.evaluate(prices)
+    return run, len(book)
+
+
+@benchmark("SignalProcessor.process")
+def bench_signal_process():
+    from risk import RiskLimits
+    from signal_processor import SignalProcessor
+    processor = SignalProcessor()
+    processor.settle_delay = 0
+    processor.debouncer.delay = 0
+    # FakeDelta positions do not change when orders fill, so the closes and
+    # entries of a run would pile up against real limits; keep them out of
+    # the way so every signal reaches order submission
+    processor.risk.limits = RiskLimits(max_order_size=10, max_position_size=1e9, max_notional=1e15,
+                                       leverage=100, min_free_margin=0)
+    exchange = processor.order_handler.order_manager.client.exchange
+    exchange.positions = [fakes.make_position(0, fakes.LAST_PRICE, 1)]
+    trade_exchange = processor.order_handler.trade_manager.client.exchange
+    trade_exchange.positions = exchange.positions
+    signals = []
+    for i in range(100):
+        text = "buy" if i % 2 == 0 else "short"
+        signals.append({
+            "last_signal": {"text": "%s %d" % (text, i), "price": str(fakes.LAST_PRICE + i)},
+            "supply_zone": {"min": str(fakes.LAST_PRICE + 500)},
+            "demand_zone": {"min": str(fakes.LAST_PRICE - 500)},
+        })
+
+    def run():
+        processor.deduplicator.clear()
+        processor.reconciler.sync()
+        processor.risk.refresh()
+        for signal in signals:
+            processor.process(signal)
+    return run, len(signals)
+
+
+@benchmark("OrderHandler.handle_take_profit[21 positions, 2ms RTT]", tolerance=IO_TOLERANCE)
+def bench_take_profit():
+    from order_manager import OrderHandler, OrderManager
+    from trade_manager import TradeManager
+    order_manager = OrderManager()
+    trade_manager = TradeManager()
+    order_manager.client.exchange.positions = fakes.make_positions(21)
+    order_manager.client.exchange.latency = trade_manager.client.exchange.latency = 0.002
+    handler = OrderHandler(order_manager, trade_manager)
+
+    def run():
+        handler.handle_take_profit("BTCUSD")
+    return run, 21
+
+
+@benchmark("RiskManager.check")
+def bench_risk_check():
+    from exchange import DeltaExchangeClient
+    from risk import RiskLimits, RiskManager
+    risk = RiskManager(DeltaExchangeClient(), limits=RiskLimits(10, 10 ** 9, 1e12, 10, 0))
+    risk.client.exchange.positions = fakes.make_positions(100)
+    risk.client.exchange.fetch_balance = lambda params={}: {"USD": {"free": 1e12}}
+
+    def run():
+        risk.refresh()
+        for i in range(1000):
+            risk.check("BTCUSD", "buy" if i % 2 else "sell", 1 + i % 3, fakes.LAST_PRICE)
+    return run, 1000
+
+
+@benchmark("DeltaExchangeClient.price_to_precision")
+def bench_price_to_precision():
+    from exchange import DeltaExchangeClient
+    client = DeltaExchangeClient()
+    prices = [fakes.LAST_PRICE + i * 0.013 for i in range(1000)]
+
+    def run():
+        for price in prices:
+            client.price_to_precision("BTCUSD", price)
+    return run, len(prices)
+
+
+@benchmark("utils.timestamp_to_str")
+def bench_timestamp_to_str():
+    import utils
+    timestamps = [1742402453659 + i * 7 for i in range(1000)]
+
+    def run():
+        for ts in timestamps:
+            utils.timestamp_to_str(ts, unit="ms")
+    return run, len(timestamps)
+
+
+def _order_path_client(cassette=None, url=None):
+    """A client wired to a real ccxt delta that talks to a local HTTP stand-in (or a cassette)."""
+    from exchange import DeltaExchangeClient
+    from execution import OrderSubmitter
+    server = None if url else fakes.LocalDeltaServer()
+    client = DeltaExchangeClient()
+    client.exchange = fakes.real_delta(url or server.url)
+    if cassette:
+        client.use_cassette(cassette)
+    else:
+        client.submitter = OrderSubmitter(client)
+    client._instrument_exchange()
+    client.load_markets()
+    return client, server
+
+
+ORDER_PARAMS = {"time_in_force": "gtc", "client_order_id": "bench"}
+
+
+@benchmark("order submit: ccxt create_order", tolerance=IO_TOLERANCE)
+def bench_ccxt_submit():
+    client, server = _order_path_client()
+
+    def run():
+        client.exchange.create_order("BTC/USD:USD", "limit", "buy", 1, 84000.5, ORDER_PARAMS)
+    return run, 1
+
+
+@benchmark("order submit: FastOrderClient", tolerance=IO_TOLERANCE)
+def bench_fast_submit():
+    from fast_orders import FastOrderClient
+    client, server = _order_path_client()
+    fast = FastOrderClient(client, base_url=server.url)
+    fast.warm(["BTCUSD"])
+
+    def run():
+        fast.create_order("BTCUSD", "limit", "buy", 1, 84000.5, ORDER_PARAMS)
+    return run, 1
+
+
+@benchmark("order submit: ccxt (cassette replay)")
+def bench_cassette_replay():
+    import tempfile
+    from cassette import Cassette, RECORD, REPLAY
+    path = os.path.join(tempfile.mkdtemp(), "orders.jsonl")
+    recorder = Cassette(path, RECORD)
+    client, server = _order_path_client(recorder)
+    for i in range(10):
+        client.create_limit_order("BTC/USD:USD", "buy", 1 + i, 84000.5, {"time_in_force": "gtc"}, "c%d" % i)
+    recorder.close()
+    server.close()
+
+    client, _ = _order_path_client(Cassette(path, REPLAY), url="http://127.0.0.1:9")
+
+    def run():
+        client.exchange.create_order("BTC/USD:USD", "limit", "buy", 1, 84000.5, ORDER_PARAMS)
+    return run, 1
+
+
+@benchmark("order build+sign: ccxt")
+def bench_ccxt_build():
+    client, server = _order_path_client()
+    exchange = client.exchange
+
+    def run():
+        request = exchange.extend({"product_id": 27, "size": exchange.amount_to_precision("BTC/USD:USD", 1),
+                                   "side": "buy", "order_type": "limit_order",
+                                   "limit_price": exchange.price_to_precision("BTC/USD:USD", 84000.5)},
+                                  ORDER_PARAMS)
+        exchange.sign("orders", "private", "POST", request)
+    return run, 1
+
+
+@benchmark("order build+sign: FastOrderClient")
+def bench_fast_build():
+    from fast_orders import FastOrderClient
+    client, server = _order_path_client()
+    fast = FastOrderClient(client, base_url=server.url)
+    fast.warm(["BTCUSD"])
+
+    def run():
+        fast.build_request("BTCUSD", "limit", "buy", 1, 84000.5, ORDER_PARAMS)
+    return run, 1
+
+
+def isolate():
+    """
+    Drop process-wide state a previous benchmark left behind, so every
+    benchmark measures the same thing in a full run as it does under ``-k``.
+    """
+    import binance_ws
+    import metrics
+    import reconciler
+    # Per-account reconcilers keep the client of whoever asked first
+    with reconciler._reconcilers_lock:
+        reconciler._reconcilers.clear()
+    # A fresh websocket price would serve lookups that otherwise hit the ticker path
+    binance_ws.current_price = binance_ws.last_update = None
+    del binance_ws.listeners[:]
+    metrics.REGISTRY.reset()
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f).get("benchmarks", {})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline hot-path benchmarks")
+    parser.add_argument("--update", action="store_true", help="rewrite the baseline file with this run")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown versus baseline as a fraction (default 0.25)")
+    parser.add_argument("-k", dest="keyword", default="", help="only run benchmarks containing this text")
+    parser.add_argument("--passes", type=int, default=None,
+                        help="full passes over the suite; a benchmark reports its best pass, or its slowest "
+                             "with --update (default 1, %d with --update)" % UPDATE_PASSES)
+    args = parser.parse_args(argv)
+
+    fakes.install()
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.CRITICAL)
+
+    baseline = load_baseline(args.baseline)
+    selected = [(name, setup, tolerance) for name, (setup, tolerance) in BENCHMARKS.items()
+                if args.keyword in name]
+    passes = args.passes or (UPDATE_PASSES if args.update else 1)
+    timings = {name: [] for name, _, _ in selected}
+    for index in range(passes):
+        last = index == passes - 1
+        for name, setup, tolerance in selected:
+            isolate()
+            fn, ops = setup()
+            us_per_op = measure(fn, ops)
+            base = baseline.get(name, {}).get("us_per_op")
+            tolerance = args.tolerance if tolerance is None else tolerance
+            if last and base and not args.update and min(timings[name] + [us_per_op]) / base - 1 > tolerance:
+                us_per_op = min(us_per_op, measure(fn, ops))
+            timings[name].append(us_per_op)
+
+    results = {}
+    regressions = []
+    for name, _, tolerance in selected:
+        us_per_op = max(timings[name]) if args.update else min(timings[name])
+        base = baseline.get(name, {}).get("us_per_op")
+        tolerance = args.tolerance if tolerance is None else tolerance
+        results[name] = {"us_per_op": round(us_per_op, 3)}
+
+        line = "%-42s %12.3f us/op" % (name, us_per_op)
+        if base:
+            change = us_per_op / base - 1
+            line += "   baseline %10.3f  (%+.1f%%)" % (base, change * 100)
+            if change > tolerance:
+                regressions.append(name)
+                line += "  REGRESSION"
+        print(line)
+
+    if args.update:
+        merged = dict(baseline)
+        merged.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "benchmarks": merged,
+            }, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print("Baseline written to %s" % args.baseline)
+        return 0
+
+    if regressions:
+        print("Slower than baseline beyond tolerance: %s" % ", ".join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,12 +2,22 @@ import json
 import threading
 import time
 import websocket
+import metrics
 
 # Global variable to store the latest BTC/USDT price
 current_price = None
+last_update = None
+# Callables invoked as listener(price, timestamp) on every trade
+listeners = []
+
+WS_MESSAGES = metrics.counter("binance_ws_messages_total", "Messages received on the Binance websocket")
+WS_ERRORS = metrics.counter("binance_ws_errors_total", "Binance websocket message or connection errors")
+metrics.gauge("binance_ws_price_age_seconds", "Seconds since the last Binance trade price",
+              lambda: time.time() - last_update if last_update else None)
 
 def on_message(ws, message):
-    global current_price
+    global current_price, last_update
+    WS_MESSAGES.inc()
     try:
         data = json.loads(message)
         # Ensure the necessary keys exist
@@ -20,10 +30,15 @@ def on_message(ws, message):
             "sell_qty": float(data["q"]) if data["m"] else 0
         }
         current_price = trade_data["price"]
+        last_update = trade_data["timestamp"]
+        for listener in listeners:
+            listener(current_price, last_update)
     except Exception as e:
+        WS_ERRORS.inc()
         print("Error processing message:", e)
 
 def on_error(ws, error):
+    WS_ERRORS.inc()
     print("WebSocket error:", error)
 
 def on_close(ws, close_status_code, close_msg):
@@ -0,0 +1,159 @@
+import collections
+import gzip
+import json
+import logging
+import threading
+from urllib.parse import urlsplit
+import ccxt
+
+logger = logging.getLogger(__name__)
+
+RECORD = "record"
+REPLAY = "replay"
+
+_cassettes = {}
+_cassettes_lock = threading.Lock()
+
+
+class CassetteMiss(Exception):
+    """Replay found no recorded response for a request."""
+
+
+def _open(path, mode):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def _target(url):
+    parts = urlsplit(url)
+    return parts.path + ("?" + parts.query if parts.query else "")
+
+
+class Cassette:
+    """
+    Records ccxt REST exchanges to a JSON-lines file and plays them back.
+
+    Each line holds one request (method, path and query, body) with either
+    its parsed response or the ccxt exception it raised; ``.gz`` paths are
+    gzip-compressed. Hosts and auth headers are not stored, so cassettes
+    replay against any base URL and carry no credentials.
+
+    On replay, responses are served from an in-memory index. A request is
+    matched on method, path and body first, then on method and path alone
+    (bodies carry per-order client ids). Each recorded response is served
+    once, in recording order, whichever way it was matched; when a
+    request's responses run out its last one is repeated. Replayed
+    responses are shared objects and must not be mutated.
+
+    Recording starts a fresh file unless ``append`` is set, in which case
+    replay serves the earlier sessions' responses first.
+    """
+
+    def __init__(self, path, mode, append=False):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError("Cassette mode must be %r or %r, got %r" % (RECORD, REPLAY, mode))
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._exact = {}
+        self._loose = {}
+        self._file = None
+        if mode == REPLAY:
+            self._load()
+        else:
+            self._file = _open(path, "a" if append else "w")
+
+    def _load(self):
+        exact = collections.defaultdict(list)
+        loose = collections.defaultdict(list)
+        count = 0
+        with _open(self.path, "r") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                slot = [entry, False]  # (recorded exchange, already served)
+                path = entry["u"].split("?", 1)[0]
+                exact[(entry["m"], entry["u"], entry.get("b"))].append(slot)
+                loose[(entry["m"], path)].append(slot)
+                count += 1
+        self._exact = {key: _Track(slots) for key, slots in exact.items()}
+        self._loose = {key: _Track(slots) for key, slots in loose.items()}
+        logger.info("Loaded %d recorded exchanges from %s", count, self.path)
+
+    def record(self, method, url, body, response=None, error=None):
+        entry = {"m": method, "u": _target(url)}
+        if body:
+            entry["b"] = body
+        if error is not None:
+            entry["e"] = [type(error).__name__, str(error)]
+        else:
+            entry["r"] = response
+        line = json.dumps(entry, separators=(",", ":"), default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def play(self, method, url, body):
+        target = _target(url)
+        with self._lock:
+            track = self._exact.get((method, target, body or None))
+            if track is None:
+                track = self._loose.get((method, target.split("?", 1)[0]))
+            if track is None:
+                raise CassetteMiss("No recorded response for %s %s" % (method, target))
+            entry = track.next()
+        error = entry.get("e")
+        if error:
+            raise getattr(ccxt, error[0], ccxt.ExchangeError)(error[1])
+        return entry["r"]
+
+    def wrap(self, fetch):
+        """Wrap a ccxt ``fetch(url, method, headers, body)`` to record or replay through this cassette."""
+        if self.mode == REPLAY:
+            def replay_fetch(url, method="GET", headers=None, body=None):
+                return self.play(method, url, body)
+            return replay_fetch
+
+        def record_fetch(url, method="GET", headers=None, body=None):
+            try:
+                response = fetch(url, method, headers, body)
+            except ccxt.BaseError as e:
+                self.record(method, url, body, error=e)
+                raise
+            self.record(method, url, body, response)
+            return response
+        return record_fetch
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+class _Track:
+    """Recorded exchanges for one match key; slots are shared between the exact and loose index."""
+
+    __slots__ = ("slots", "position")
+
+    def __init__(self, slots):
+        self.slots = slots
+        self.position = 0
+
+    def next(self):
+        slots = self.slots
+        while self.position < len(slots) - 1 and slots[self.position][1]:
+            self.position += 1
+        slot = slots[self.position]
+        slot[1] = True
+        return slot[0]
+
+
+def get_cassette(path, mode):
+    """Shared ``Cassette`` for ``path``, so every client in the process records to or replays from one index."""
+    with _cassettes_lock:
+        cassette = _cassettes.get(path)
+        if cassette is None or cassette.mode != mode:
+            cassette = _cassettes[path] = Cassette(path, mode)
+        return cassette
@@ -17,20 +17,137 @@ FIXED_OFFSET = int(os.getenv('FIXED_OFFSET', 100))
 
 # Trading parameters
 DEFAULT_ORDER_TYPE = 'limit'
+ORDER_SIZE = int(os.getenv('ORDER_SIZE', '1'))  # contracts per entry, before risk sizing
 TRAILING_STOP_PERCENT = 2.0  # 2% trailing stop
 BASKET_ORDER_ENABLED = True
+# Seconds to let cancels settle before placing a new entry order
+ORDER_SETTLE_DELAY = float(os.getenv('ORDER_SETTLE_DELAY', '2'))
+
+# REST timeout and retry policy for order submission. Retries reuse the
+# order's client order id and check the exchange before resubmitting.
+REST_TIMEOUT_MS = int(os.getenv('REST_TIMEOUT_MS', '5000'))
+ORDER_RETRY_ATTEMPTS = int(os.getenv('ORDER_RETRY_ATTEMPTS', '3'))
+ORDER_RETRY_BASE_DELAY = float(os.getenv('ORDER_RETRY_BASE_DELAY', '0.2'))
+ORDER_RETRY_MAX_DELAY = float(os.getenv('ORDER_RETRY_MAX_DELAY', '2'))
+ORDER_RECONCILE_LOOKBACK = int(os.getenv('ORDER_RECONCILE_LOOKBACK', '50'))
+# Orders found by client id count as ours only if created after the first
+# submit attempt, allowing this much exchange/local clock difference (seconds)
+ORDER_LOOKUP_CLOCK_SKEW = float(os.getenv('ORDER_LOOKUP_CLOCK_SKEW', '1'))
+# Send limit/market orders through fast_orders.FastOrderClient instead of
+# ccxt (ignored while an exchange cassette is attached)
+FAST_ORDER_PATH = os.getenv('FAST_ORDER_PATH', 'true').lower() in ('1', 'true', 'yes')
+# Threads submitting the independent orders of one take-profit or close-all batch
+ORDER_BATCH_WORKERS = int(os.getenv('ORDER_BATCH_WORKERS', '8'))
+
+# Pre-trade risk checks against a cached balance and positions refreshed
+# every RISK_REFRESH_INTERVAL seconds (and after each order). Entries are
+# rejected while the cache is older than RISK_MAX_STALENESS. Sizes are in
+# contracts, notional and margin in USD; accounts can override any limit
+# with a RISK_LIMITS dict in ACCOUNTS.
+RISK_CHECKS = os.getenv('RISK_CHECKS', 'true').lower() in ('1', 'true', 'yes')
+RISK_REFRESH_INTERVAL = float(os.getenv('RISK_REFRESH_INTERVAL', '10'))
+RISK_MAX_STALENESS = float(os.getenv('RISK_MAX_STALENESS', '60'))
+RISK_BALANCE_CURRENCY = os.getenv('RISK_BALANCE_CURRENCY', 'USD')
+RISK_LIMITS = {
+    "max_order_size": int(os.getenv('RISK_MAX_ORDER_SIZE', '10')),
+    "max_position_size": int(os.getenv('RISK_MAX_POSITION_SIZE', '10')),
+    "max_notional": float(os.getenv('RISK_MAX_NOTIONAL', '10000')),
+    "leverage": float(os.getenv('RISK_LEVERAGE', '10')),
+    "min_free_margin": float(os.getenv('RISK_MIN_FREE_MARGIN', '0')),
+}
+
+# Account state reconciliation. Positions and open orders are synced every
+# RECONCILE_ACTIVE_INTERVAL seconds while anything is open, backing off to
+# RECONCILE_IDLE_INTERVAL while flat; the balance is refetched every
+# RECONCILE_BALANCE_INTERVAL seconds or when something changed. Order
+# decisions resync first if the cached state is older than RECONCILE_MAX_AGE.
+RECONCILE_ACTIVE_INTERVAL = float(os.getenv('RECONCILE_ACTIVE_INTERVAL', '1'))
+RECONCILE_IDLE_INTERVAL = float(os.getenv('RECONCILE_IDLE_INTERVAL', '15'))
+RECONCILE_BALANCE_INTERVAL = float(os.getenv('RECONCILE_BALANCE_INTERVAL', '30'))
+RECONCILE_MAX_AGE = float(os.getenv('RECONCILE_MAX_AGE', '2'))
+
+# Signals with identical content inside this window are duplicates, and
+# bursts are collapsed to the latest signal after a quiet period (seconds)
+SIGNAL_DEDUP_WINDOW = float(os.getenv('SIGNAL_DEDUP_WINDOW', '60'))
+SIGNAL_DEBOUNCE_DELAY = float(os.getenv('SIGNAL_DEBOUNCE_DELAY', '0.5'))
+SIGNAL_DEBOUNCE_MAX_DELAY = float(os.getenv('SIGNAL_DEBOUNCE_MAX_DELAY', '2'))
 
 # Logging configuration
 LOG_FILE = os.getenv('LOG_FILE', 'trading.log')
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'DEBUG')
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', str(50 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', '5'))
+LOG_JSON = os.getenv('LOG_JSON', 'true').lower() in ('1', 'true', 'yes')
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+# Repeats of a log call (same logger, level and message template) are
+# suppressed within this window; levels at or above LOG_RATE_LIMIT_EXEMPT_LEVEL
+# are never suppressed
+LOG_RATE_LIMIT_SECONDS = float(os.getenv('LOG_RATE_LIMIT_SECONDS', '30'))
+LOG_RATE_LIMIT_EXEMPT_LEVEL = os.getenv('LOG_RATE_LIMIT_EXEMPT_LEVEL', 'ERROR')
 
 
+# Local L2 order books. With ORDERBOOK_ENTRY enabled, limit entries are
+# priced from the ORDERBOOK_VENUE book's microprice instead of the signal
+# price, as long as the book is fresher than ORDERBOOK_MAX_AGE seconds and
+# its mid is within ORDERBOOK_MAX_DEVIATION of the signal price.
+ORDERBOOK_ENTRY = os.getenv('ORDERBOOK_ENTRY', 'false').lower() in ('1', 'true', 'yes')
+ORDERBOOK_VENUE = os.getenv('ORDERBOOK_VENUE', 'delta')
+ORDERBOOK_MAX_AGE = float(os.getenv('ORDERBOOK_MAX_AGE', '2'))
+ORDERBOOK_MAX_DEVIATION = float(os.getenv('ORDERBOOK_MAX_DEVIATION', '500'))
+ORDERBOOK_MAX_LEVELS = int(os.getenv('ORDERBOOK_MAX_LEVELS', '1000'))
+ORDERBOOK_RECONNECT_DELAY = float(os.getenv('ORDERBOOK_RECONNECT_DELAY', '1'))
+DELTA_WS_URL = os.getenv('DELTA_WS_URL', 'wss://socket.india.delta.exchange')
+BINANCE_WS_URL = os.getenv('BINANCE_WS_URL', 'wss://fstream.binance.com/ws')
+BINANCE_DEPTH_SNAPSHOT_URL = os.getenv('BINANCE_DEPTH_SNAPSHOT_URL', 'https://fapi.binance.com/fapi/v1/depth')
+# Delta product symbol -> Binance futures symbol
+BINANCE_SYMBOLS = {
+    "BTCUSD": "BTCUSDT",
+}
+
+# Record every Delta REST exchange to this cassette file, or replay them
+# offline from it (EXCHANGE_CASSETTE_MODE=record|replay). Empty disables it.
+EXCHANGE_CASSETTE = os.getenv('EXCHANGE_CASSETTE', '')
+EXCHANGE_CASSETTE_MODE = os.getenv('EXCHANGE_CASSETTE_MODE', 'replay')
+
 # Market data caching TTL (in seconds)
 MARKET_CACHE_TTL = int(os.getenv('MARKET_CACHE_TTL', '300'))
 
+# Ticker price caching TTL and maximum age of a websocket price (in seconds)
+PRICE_CACHE_TTL = float(os.getenv('PRICE_CACHE_TTL', '0.5'))
+PRICE_FEED_MAX_AGE = float(os.getenv('PRICE_FEED_MAX_AGE', '5'))
+
+# Fallback tick/lot sizes for symbols missing from the loaded markets
+DEFAULT_TICK_SIZE = os.getenv('DEFAULT_TICK_SIZE', '0.5')
+DEFAULT_LOT_SIZE = os.getenv('DEFAULT_LOT_SIZE', '1')
+# Seconds the default precision is used before a symbol's market is retried
+PRECISION_RETRY_INTERVAL = float(os.getenv('PRECISION_RETRY_INTERVAL', '30'))
+
+# Local Prometheus metrics endpoint (set METRICS_PORT=0 to disable). Account
+# worker processes serve their own metrics on METRICS_PORT + 1 + worker index.
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9100'))
+
+# Base units per contract, used to turn contract PnL into USD
+CONTRACT_VALUES = {
+    "BTCUSD": float(os.getenv('BTCUSD_CONTRACT_VALUE', '0.001')),
+}
+DEFAULT_CONTRACT_VALUE = 1.0
+
+# Conversion rates from USD for PnL reporting
+FX_RATES = {
+    "USD": 1.0,
+    "INR": float(os.getenv('USD_INR_RATE', '85')),
+}
+
 # Database configuration (if needed)
 DATABASE_URI = os.getenv('DATABASE_URI', 'sqlite:///trading.db')
 
+# Optional JSON file overriding "profit_trailing" and "accounts" below. It is
+# validated and compiled by settings.py and hot-reloaded when it changes
+# (polled every CONFIG_WATCH_INTERVAL seconds) or on SIGHUP.
+CONFIG_FILE = os.getenv('CONFIG_FILE', 'config.json')
+CONFIG_WATCH_INTERVAL = float(os.getenv('CONFIG_WATCH_INTERVAL', '5'))
+
 # Profit trailing configuration
 PROFIT_TRAILING_CONFIG = {
     "start_trailing_profit_pct": 0.005,
@@ -44,10 +161,17 @@ PROFIT_TRAILING_CONFIG = {
     "trailing_unit": "percent"
 }
 
-# Account mapping for Firebase signal routing
-# Account mapping for Firebase signal routing
+# Account mapping for Firebase signal routing. Accounts may carry their own
+# API_KEY/API_SECRET; without them the DELTA_API_KEY credentials are used.
 ACCOUNTS = {
     "MAIN": {
         "REDIS_KEY": "signal_MAIN"
     }
 }
+
+# Number of account worker processes. 0 keeps the single-process mode
+# trading the MAIN account; otherwise main.py runs the Binance feed once, publishes it through a
+# shared-memory price table, and shards ACCOUNTS across the workers.
+ACCOUNT_WORKERS = int(os.getenv('ACCOUNT_WORKERS', '0'))
+SHARED_PRICE_SYMBOLS = ["BTCUSD"]
+WORKER_RESTART_DELAY = float(os.getenv('WORKER_RESTART_DELAY', '5'))
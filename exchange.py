@@ -1,16 +1,30 @@
 import time
+import threading
 import ccxt
 import config
 import logging
+import metrics
+import settings
+from cassette import REPLAY, get_cassette
+from execution import OrderSubmitter
+from positions import PositionBook
+from quantize import Quantizer, ROUND_NEAREST
 
 logger = logging.getLogger(__name__)
 
+REST_CALLS = metrics.counter("delta_rest_calls_total", "REST requests sent to Delta", ("endpoint",))
+REST_ERRORS = metrics.counter("delta_rest_errors_total", "REST requests to Delta that raised", ("endpoint",))
+REST_LATENCY = metrics.summary("delta_rest_latency_seconds", "Delta REST request latency", ("endpoint",))
+RATE_LIMIT_WAITS = metrics.summary("delta_rate_limit_wait_seconds", "Time spent waiting on the ccxt rate limiter")
+
 class DeltaExchangeClient:
-    def __init__(self):
+    def __init__(self, account="MAIN"):
+        self.account = account
+        account_settings = settings.current().accounts.get(account)
         try:
             self.exchange = ccxt.delta({
-                'apiKey': config.API_KEY,
-                'secret': config.API_SECRET,
+                'apiKey': account_settings.api_key if account_settings else config.API_KEY,
+                'secret': account_settings.api_secret if account_settings else config.API_SECRET,
                 'urls': {
                     'api': {
                         'public': config.DELTA_API_URLS['public'],
@@ -18,7 +32,12 @@ class DeltaExchangeClient:
                     }
                 },
                 'enableRateLimit': True,
+                'timeout': config.REST_TIMEOUT_MS,
             })
+            self.cassette = None
+            if config.EXCHANGE_CASSETTE:
+                self.use_cassette(get_cassette(config.EXCHANGE_CASSETTE, config.EXCHANGE_CASSETTE_MODE))
+            self._instrument_exchange()
             logger.debug("DeltaExchangeClient initialized successfully.")
         except Exception as e:
             logger.error("Error initializing DeltaExchangeClient: %s", e)
@@ -26,6 +45,70 @@ class DeltaExchangeClient:
 
         self._market_cache = None
         self._market_cache_time = 0
+        self.quantizer = Quantizer(self)
+        # The fast path bypasses ccxt's transport, so it is off while a cassette is attached
+        self.fast_orders = None
+        if config.FAST_ORDER_PATH and not self.cassette:
+            # Imported here: fast_orders shares this module's REST metrics
+            from fast_orders import FastOrderClient
+            self.fast_orders = FastOrderClient(self)
+        self.submitter = OrderSubmitter(
+            self, create_order=self.fast_orders.create_order if self.fast_orders else None
+        )
+
+    def use_cassette(self, cassette):
+        """
+        Route ccxt's transport through ``cassette``: record every REST exchange,
+        or replay them offline with rate limiting disabled. Attach before
+        ``_instrument_exchange`` so replayed calls still show up in metrics.
+
+        The fast order path bypasses ccxt's transport, so it is switched off
+        and orders go through ccxt (and the cassette) from here on.
+        """
+        self.cassette = cassette
+        self.exchange.fetch = cassette.wrap(self.exchange.fetch)
+        if cassette.mode == REPLAY:
+            self.exchange.enableRateLimit = False
+        self.fast_orders = None
+        self.submitter = OrderSubmitter(self)
+        logger.info("Delta client %s using %s cassette %s", self.account, cassette.mode, cassette.path)
+
+    def _instrument_exchange(self):
+        """
+        Wrap the ccxt request path so every REST call, whichever method issued
+        it, is counted and timed per endpoint, and rate-limiter sleeps are
+        recorded separately from request latency.
+        """
+        exchange = self.exchange
+        fetch2, fetch, throttle = exchange.fetch2, exchange.fetch, exchange.throttle
+        local = threading.local()
+
+        def instrumented_fetch2(path, api='public', method='GET', *args, **kwargs):
+            local.endpoint = "%s %s" % (method, path)
+            return fetch2(path, api, method, *args, **kwargs)
+
+        def instrumented_fetch(url, method='GET', headers=None, body=None):
+            endpoint = getattr(local, 'endpoint', method)
+            REST_CALLS.labels(endpoint).inc()
+            start = time.perf_counter()
+            try:
+                return fetch(url, method, headers, body)
+            except Exception:
+                REST_ERRORS.labels(endpoint).inc()
+                raise
+            finally:
+                REST_LATENCY.labels(endpoint).observe(time.perf_counter() - start)
+
+        def instrumented_throttle(cost=None):
+            start = time.perf_counter()
+            throttle(cost)
+            waited = time.perf_counter() - start
+            if waited > 0.001:
+                RATE_LIMIT_WAITS.observe(waited)
+
+        exchange.fetch2 = instrumented_fetch2
+        exchange.fetch = instrumented_fetch
+        exchange.throttle = instrumented_throttle
 
     def load_markets(self, reload=False):
         current_time = time.time()
@@ -36,12 +119,29 @@ class DeltaExchangeClient:
             markets = self.exchange.load_markets(reload)
             self._market_cache = markets
             self._market_cache_time = current_time
-            logger.debug("Markets loaded: %s", list(markets.keys()))
+            self.quantizer.clear()
+            if self.fast_orders:
+                self.fast_orders.clear()
+            logger.debug("Markets loaded: %d markets", len(markets))
             return markets
         except Exception as e:
             logger.error("Error loading markets: %s", e)
             raise
 
+    def market(self, symbol):
+        """Market for a unified symbol (``BTC/USD:USD``) or exchange id (``BTCUSD``), or None."""
+        markets = self.load_markets()
+        market = markets.get(symbol)
+        if market is None:
+            market = next((m for m in markets.values() if m.get('id') == symbol), None)
+        return market
+
+    def price_to_precision(self, symbol, price, mode=ROUND_NEAREST):
+        return self.quantizer.get(symbol).price_str(price, mode)
+
+    def amount_to_precision(self, symbol, amount):
+        return self.quantizer.get(symbol).amount_str(amount)
+
     def fetch_balance(self):
         try:
             balance = self.exchange.fetch_balance()
@@ -51,15 +151,24 @@ class DeltaExchangeClient:
             logger.error("Error fetching balance: %s", e)
             raise
 
-    def create_limit_order(self, symbol, side, amount, price, params=None):
+    def create_limit_order(self, symbol, side, amount, price, params=None, client_order_id=None):
         try:
-            order = self.exchange.create_order(symbol, 'limit', side, amount, price, params or {})
+            order = self.submitter.submit(symbol, 'limit', side, amount, price, params, client_order_id)
             logger.debug("Limit order created: %s", order)
             return order
         except Exception as e:
             logger.error("Error creating limit order: %s", e)
             raise
 
+    def create_market_order(self, symbol, side, amount, params=None, client_order_id=None):
+        try:
+            order = self.submitter.submit(symbol, 'market', side, amount, None, params, client_order_id)
+            logger.debug("Market order created: %s", order)
+            return order
+        except Exception as e:
+            logger.error("Error creating market order: %s", e)
+            raise
+
     def cancel_order(self, order_id, symbol, params=None):
         try:
             result = self.exchange.cancel_order(order_id, symbol, params or {})
@@ -101,6 +210,9 @@ class DeltaExchangeClient:
             logger.error("Error fetching positions: %s", e)
             raise
 
+    def fetch_position_book(self):
+        return PositionBook.from_ccxt(self.fetch_positions())
+
 if __name__ == '__main__':
     client = DeltaExchangeClient()
     try:
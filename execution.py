@@ -0,0 +1,237 @@
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import ccxt
+import config
+import metrics
+
+logger = logging.getLogger(__name__)
+
+BATCH_WALL_TIME = metrics.summary("order_batch_seconds", "Wall time of concurrently submitted order batches", ("kind",))
+
+# Delta accepts client order ids of up to 32 characters
+CLIENT_ORDER_ID_LENGTH = 32
+
+
+def client_order_id(*parts):
+    """Deterministic 32-character client order id derived from ``parts``."""
+    key = "|".join(str(part) for part in parts)
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=CLIENT_ORDER_ID_LENGTH // 2).hexdigest()
+
+
+def signal_key(signal_data):
+    """Stable fingerprint of a signal's content, used to recognise duplicate deliveries."""
+    payload = (signal_data or {}).get("last_signal", signal_data)
+    return client_order_id(json.dumps(payload, sort_keys=True, default=str))
+
+
+class RetryPolicy:
+    __slots__ = ("attempts", "base_delay", "max_delay")
+
+    def __init__(self, attempts=None, base_delay=None, max_delay=None):
+        self.attempts = config.ORDER_RETRY_ATTEMPTS if attempts is None else attempts
+        if self.attempts < 1:
+            raise ValueError("Order retry attempts must be at least 1, got %r" % self.attempts)
+        self.base_delay = config.ORDER_RETRY_BASE_DELAY if base_delay is None else base_delay
+        self.max_delay = config.ORDER_RETRY_MAX_DELAY if max_delay is None else max_delay
+
+    def delay(self, attempt):
+        """Full-jitter exponential backoff for the given zero-based retry."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class OrderSubmitter:
+    """
+    Submits orders so that a retry can never create a second order.
+
+    Every order carries a client order id. When ``create_order`` fails with
+    an ambiguous error (timeout, network failure, duplicate id) the exchange
+    is searched for that id before anything is resubmitted; if the lookup
+    itself fails, the next attempt retries the lookup rather than the order.
+    Only orders created since the first attempt (less
+    ``ORDER_LOOKUP_CLOCK_SKEW`` seconds) count as found.
+
+    Client ids are deterministic, so the same decision made again later
+    reuses one. If the exchange rejects it as a duplicate and the order
+    holding it is already closed, the id is re-derived from that order's id
+    and the submission continues under the new id.
+    """
+
+    def __init__(self, client, policy=None, create_order=None):
+        self.client = client
+        self.policy = policy or RetryPolicy()
+        self.create_order = create_order or client.exchange.create_order
+
+    def submit(self, symbol, order_type, side, amount, price=None, params=None, client_order_id=None):
+        cid = client_order_id or uuid.uuid4().hex
+        params = dict(params or {}, client_order_id=cid)
+        since = int((time.time() - config.ORDER_LOOKUP_CLOCK_SKEW) * 1000)
+
+        last_error = None
+        needs_reconcile = False
+        for attempt in range(self.policy.attempts):
+            if attempt:
+                time.sleep(self.policy.delay(attempt - 1))
+            if needs_reconcile:
+                try:
+                    existing = self.find_order(symbol, cid, since)
+                except Exception as e:
+                    logger.warning("Order lookup for %s failed, not resubmitting yet: %s", cid, e)
+                    continue
+                if existing:
+                    logger.info("Order %s already accepted by exchange: %s", cid, existing.get('id'))
+                    return existing
+                if isinstance(last_error, ccxt.DuplicateOrderId):
+                    try:
+                        cid = self._reissue(symbol, cid) or cid
+                    except Exception as e:
+                        logger.warning("Duplicate id lookup for %s failed, not resubmitting yet: %s", cid, e)
+                        continue
+                    params["client_order_id"] = cid
+                needs_reconcile = False
+
+            try:
+                return self.create_order(symbol, order_type, side, amount, price, params)
+            except (ccxt.NetworkError, ccxt.DuplicateOrderId) as e:
+                logger.warning("Order %s %s %s attempt %d failed: %s", cid, side, symbol, attempt + 1, e)
+                last_error = e
+                needs_reconcile = True
+
+        if needs_reconcile:
+            try:
+                existing = self.find_order(symbol, cid, since)
+                if existing:
+                    return existing
+            except Exception as e:
+                logger.error("Final order lookup for %s failed: %s", cid, e)
+        raise last_error
+
+    def find_order(self, symbol, cid, since=None):
+        """The order with client id ``cid``, ignoring orders created before ``since`` (epoch ms)."""
+        exchange = self.client.exchange
+        for order in exchange.fetch_open_orders(symbol):
+            if self._matches(order, cid, since):
+                return order
+        if exchange.has.get('fetchClosedOrders'):
+            for order in exchange.fetch_closed_orders(symbol, limit=config.ORDER_RECONCILE_LOOKBACK):
+                if self._matches(order, cid, since):
+                    return order
+        return None
+
+    def _reissue(self, symbol, cid):
+        """A new client id for ``cid`` if a closed order already holds it, else None."""
+        exchange = self.client.exchange
+        if not exchange.has.get('fetchClosedOrders'):
+            return None
+        for order in exchange.fetch_closed_orders(symbol, limit=config.ORDER_RECONCILE_LOOKBACK):
+            if self._client_id(order) == cid:
+                new_cid = client_order_id(cid, order.get('id'))
+                logger.info("Client id %s belongs to closed order %s, resubmitting as %s",
+                            cid, order.get('id'), new_cid)
+                return new_cid
+        return None
+
+    @classmethod
+    def _matches(cls, order, cid, since):
+        if cls._client_id(order) != cid:
+            return False
+        timestamp = order.get('timestamp')
+        if since is not None and timestamp is not None and timestamp < since:
+            logger.warning("Ignoring order %s with reused client id %s from before this submission",
+                           order.get('id'), cid)
+            return False
+        return True
+
+    @staticmethod
+    def _client_id(order):
+        return order.get('clientOrderId') or (order.get('info') or {}).get('client_order_id')
+
+
+class CloseAction:
+    """One market order flattening ``positions`` of ``symbol`` (their sizes netted)."""
+
+    __slots__ = ("symbol", "side", "size", "positions", "client_order_id")
+
+    def __init__(self, symbol, side, size, positions, client_order_id=None):
+        self.symbol = symbol
+        self.side = side
+        self.size = size
+        self.positions = positions
+        self.client_order_id = client_order_id
+
+    def __repr__(self):
+        return "CloseAction(%s %s %s, %d positions)" % (self.side, self.size, self.symbol, len(self.positions))
+
+
+def plan_closes(positions, *id_parts):
+    """
+    Net ``positions`` into one ``CloseAction`` per symbol.
+
+    Delta keeps one net position per product, so a single market order for
+    the net size flattens all of them. Symbols that already net to zero get
+    no action. ``id_parts`` (e.g. a signal key) root each action's client
+    order id; without them the ids are random.
+    """
+    by_symbol = {}
+    for position in positions:
+        if position.size:
+            by_symbol.setdefault(position.symbol, []).append(position)
+
+    actions = []
+    for symbol, group in by_symbol.items():
+        net = sum(position.size for position in group)
+        if not net:
+            continue
+        cid = None
+        if id_parts:
+            cid = client_order_id(*id_parts, "close", symbol,
+                                  *sorted("%s:%s:%s" % (p.id, p.size, p.entry_price) for p in group))
+        actions.append(CloseAction(symbol, "sell" if net > 0 else "buy", abs(net), group, cid))
+    return actions
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _order_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=config.ORDER_BATCH_WORKERS, thread_name_prefix="order-batch")
+    return _pool
+
+
+def _outcome(call):
+    try:
+        return call()
+    except Exception as e:
+        return e
+
+
+def run_batch(kind, calls):
+    """
+    Run ``calls`` (zero-argument callables) concurrently on the shared order
+    pool and wait for all of them.
+
+    Returns ``(results, seconds)``: one result per call, in order, with the
+    exception in place of the result for calls that raised, and the wall
+    time of the whole batch.
+    """
+    start = time.perf_counter()
+    if len(calls) == 1:
+        results = [_outcome(calls[0])]
+    else:
+        futures = [_order_pool().submit(_outcome, call) for call in calls]
+        results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - start
+    if calls:
+        BATCH_WALL_TIME.labels(kind).observe(elapsed)
+        logger.info("%s batch of %d actions finished in %.1f ms", kind, len(calls), elapsed * 1000)
+    return results, elapsed
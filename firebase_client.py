@@ -1,6 +1,6 @@
 import os
 import pyrebase
-import config
+import settings
 import json
 
 # Set the base directory (same as where main.py is located)
@@ -24,7 +24,7 @@ def get_signal(account_key="MAIN"):
     Fetch signal using the Redis-like key structure.
     Example: signal_MAIN, signal_V1, etc.
     """
-    redis_key = config.ACCOUNTS[account_key]["REDIS_KEY"]
+    redis_key = settings.current().accounts[account_key].redis_key
     try:
         value = db.child(redis_key).get().val()
         print(f"[get_signal] Key: {redis_key}")
@@ -48,7 +48,7 @@ def stream_signal(account_key="MAIN", callback=None):
     """
     Start realtime stream on the top-level signal key (e.g., signal_MAIN).
     """
-    redis_key = config.ACCOUNTS[account_key]["REDIS_KEY"]
+    redis_key = settings.current().accounts[account_key].redis_key
     try:
         print(f"[stream_signal] Listening on /{redis_key}")
         return db.child(redis_key).stream(callback)
@@ -1,23 +1,155 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import queue
+import threading
+import time
 import config
 
-def setup_logging():
+_listener = None
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Drops repeats of the same log call (logger, level and message template)
+    within ``interval`` seconds. The next line let through after a quiet
+    period carries the number of suppressed repeats.
+
+    Records at or above ``exempt_level`` always pass. The message is never
+    formatted here, so the filter stays cheap on the calling thread.
+    """
+
+    def __init__(self, interval, exempt_level=logging.ERROR, max_keys=10000):
+        super().__init__()
+        self.interval = interval
+        if isinstance(exempt_level, str):
+            exempt_level = logging.getLevelName(exempt_level.upper())
+        self.exempt_level = exempt_level
+        self.max_keys = max_keys
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if self.interval <= 0 or record.levelno >= self.exempt_level:
+            return True
+        key = (record.name, record.levelno, record.msg)
+
+        now = time.monotonic()
+        with self._lock:
+            last = self._seen.get(key)
+            if last is not None and now - last[0] < self.interval:
+                last[1] += 1
+                return False
+
+            if last is not None and last[1]:
+                record.suppressed = last[1]
+            self._seen[key] = [now, 0]
+            if len(self._seen) > self.max_keys:
+                self._prune(now)
+        return True
+
+    def _prune(self, now):
+        # Expired keys carry nothing worth keeping except a pending
+        # suppressed count, which is dropped along with them.
+        for key in [k for k, last in self._seen.items() if now - last[0] >= self.interval]:
+            del self._seen[key]
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueues records without formatting them on the calling thread.
+
+    The stock QueueHandler renders the message before enqueueing; here only
+    exception info is rendered eagerly and ``msg % args`` is left to the
+    listener thread. Records are dropped and counted when the queue is full
+    so a stalled disk cannot block the caller.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def prepare(self, record):
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "suppressed", 0):
+            entry["suppressed"] = record.suppressed
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        line = super().format(record)
+        if getattr(record, "suppressed", 0):
+            line += " (suppressed %d repeats)" % record.suppressed
+        return line
+
+
+def setup_logging(log_file=None):
+    global _listener
     logger = logging.getLogger()
     logger.setLevel(logging.DEBUG)
     if logger.hasHandlers():
         logger.handlers.clear()
-    file_handler = logging.FileHandler(config.LOG_FILE)
-    file_handler.setLevel(logging.DEBUG)
-    file_formatter = logging.Formatter('%(asctime)s %(levelname)s: %(message)s')
-    file_handler.setFormatter(file_formatter)
+    _stop_listener()
+
+    file_handler = logging.handlers.RotatingFileHandler(
+        log_file or config.LOG_FILE, maxBytes=config.LOG_MAX_BYTES, backupCount=config.LOG_BACKUP_COUNT
+    )
+    file_handler.setLevel(config.LOG_LEVEL)
+    if config.LOG_JSON:
+        file_handler.setFormatter(JsonFormatter())
+    else:
+        file_handler.setFormatter(TextFormatter('%(asctime)s %(levelname)s: %(message)s'))
     console_handler = logging.StreamHandler()
     console_handler.setLevel(logging.INFO)
-    console_formatter = logging.Formatter('%(asctime)s %(levelname)s: %(message)s')
+    console_formatter = TextFormatter('%(asctime)s %(levelname)s: %(message)s')
     console_handler.setFormatter(console_formatter)
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+
+    queue_handler = LazyQueueHandler(queue.Queue(config.LOG_QUEUE_SIZE))
+    queue_handler.addFilter(RateLimitFilter(config.LOG_RATE_LIMIT_SECONDS, config.LOG_RATE_LIMIT_EXEMPT_LEVEL))
+    logger.addHandler(queue_handler)
+
+    _listener = logging.handlers.QueueListener(
+        queue_handler.queue, file_handler, console_handler, respect_handler_level=True
+    )
+    _listener.start()
     return logger
 
+
+def _stop_listener():
+    global _listener
+    if _listener:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(_stop_listener)
+
 if __name__ == "__main__":
     logger = setup_logging()
     logger.info("Logging has been configured successfully.")
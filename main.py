@@ -3,6 +3,10 @@ import logging
 from signal_processor import TradingBot
 from profit_trailing import ProfitTrailing
 from logger import setup_logging
+from account_workers import AccountSupervisor
+import config
+import metrics
+import settings
 
 
 def run_profit_trailing():
@@ -15,6 +19,18 @@ def main():
     logger = logging.getLogger(__name__)
     logger.info("Starting trading system...")
 
+    # Fail fast on invalid config, then pick up edits without a restart
+    accounts = settings.current().accounts
+    settings.ConfigWatcher().start()
+
+    if config.METRICS_PORT:
+        metrics.start_http_server(config.METRICS_PORT, config.METRICS_HOST)
+
+    if config.ACCOUNT_WORKERS > 0:
+        logger.info("Sharding %d accounts across %d worker processes", len(accounts), config.ACCOUNT_WORKERS)
+        AccountSupervisor().run()
+        return
+
     # Start profit trailing as background thread
     trailing_thread = threading.Thread(target=run_profit_trailing, daemon=True)
     trailing_thread.start()
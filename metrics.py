@@ -0,0 +1,268 @@
+import threading
+import logging
+import weakref
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+
+class _Owner:
+    __slots__ = ("__weakref__",)
+
+
+class _Cells:
+    """
+    Per-thread accumulators for one metric series.
+
+    Each thread only ever writes its own cell, so an increment is a
+    thread-local lookup plus an in-place add with no lock. Scrapes sum
+    across all cells. When a thread exits its thread-local is collected, and
+    a finalizer folds the thread's cell into ``_base`` so short-lived
+    threads do not pile up cells.
+    """
+
+    __slots__ = ("_local", "_cells", "_base", "_lock")
+
+    def __init__(self):
+        self._local = threading.local()
+        self._cells = {}
+        self._base = [0, 0.0]
+        self._lock = threading.Lock()
+
+    def cell(self):
+        try:
+            return self._local.cell
+        except AttributeError:
+            cell = [0, 0.0]
+            owner = _Owner()
+            with self._lock:
+                self._cells[id(cell)] = cell
+            self._local.cell = cell
+            self._local.owner = owner
+            weakref.finalize(owner, self._retire, cell).atexit = False
+            return cell
+
+    def _retire(self, cell):
+        with self._lock:
+            self._cells.pop(id(cell), None)
+            self._base[0] += cell[0]
+            self._base[1] += cell[1]
+
+    def totals(self):
+        with self._lock:
+            count, total = self._base
+            cells = list(self._cells.values())
+        return count + sum(c[0] for c in cells), total + sum(c[1] for c in cells)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self._children[()] = self._new_child()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError("%s expects labels %s" % (self.name, self.labelnames))
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def reset(self):
+        """Drop every recorded value and labelled child."""
+        with self._lock:
+            self._children = {}
+            if not self.labelnames:
+                self._default = self._children[()] = self._new_child()
+
+    def _label_str(self, values):
+        if not values:
+            return ""
+        pairs = ",".join('%s="%s"' % (k, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+                         for k, v in zip(self.labelnames, values))
+        return "{%s}" % pairs
+
+    def render(self):
+        lines = ["# HELP %s %s" % (self.name, self.help), "# TYPE %s %s" % (self.name, self.kind)]
+        for values, child in list(self._children.items()):
+            lines.extend(self._render_child(self._label_str(values), child))
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ("_cells",)
+
+    def __init__(self):
+        self._cells = _Cells()
+
+    def inc(self, amount=1):
+        self._cells.cell()[0] += amount
+
+    @property
+    def value(self):
+        return self._cells.totals()[0]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    @property
+    def value(self):
+        return self._default.value
+
+    def _render_child(self, labels, child):
+        return ["%s%s %s" % (self.name, labels, child.value)]
+
+
+class _SummaryChild:
+    __slots__ = ("_cells",)
+
+    def __init__(self):
+        self._cells = _Cells()
+
+    def observe(self, value):
+        cell = self._cells.cell()
+        cell[0] += 1
+        cell[1] += value
+
+
+class Summary(_Metric):
+    """Count and sum of observations, e.g. call latencies in seconds."""
+
+    kind = "summary"
+
+    def _new_child(self):
+        return _SummaryChild()
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def _render_child(self, labels, child):
+        count, total = child._cells.totals()
+        return ["%s_count%s %s" % (self.name, labels, count),
+                "%s_sum%s %s" % (self.name, labels, total)]
+
+
+class Gauge(_Metric):
+    """A value read at scrape time from ``fn``, or set directly."""
+
+    kind = "gauge"
+
+    def __init__(self, name, help_text, fn=None):
+        self.fn = fn
+        self._value = 0.0
+        super().__init__(name, help_text)
+
+    def _new_child(self):
+        return self
+
+    def set(self, value):
+        self._value = value
+
+    def reset(self):
+        self._value = 0.0
+
+    @property
+    def value(self):
+        if self.fn is None:
+            return self._value
+        try:
+            value = self.fn()
+        except Exception:
+            return float("nan")
+        return float("nan") if value is None else value
+
+    def _render_child(self, labels, child):
+        return ["%s%s %s" % (self.name, labels, self.value)]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric):
+                    raise ValueError("Metric %s already registered as %s" % (metric.name, existing.kind))
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def reset(self):
+        """Zero every registered metric, e.g. between benchmarks."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.reset()
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name, help_text, labelnames=()):
+    return REGISTRY.register(Counter(name, help_text, labelnames))
+
+
+def summary(name, help_text, labelnames=()):
+    return REGISTRY.register(Summary(name, help_text, labelnames))
+
+
+def gauge(name, help_text, fn=None):
+    return REGISTRY.register(Gauge(name, help_text, fn))
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port, host="127.0.0.1", registry=REGISTRY):
+    """Serve ``/metrics`` in Prometheus text format from a daemon thread."""
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True)
+    thread.start()
+    logger.info("Metrics endpoint listening on http://%s:%s/metrics", host, server.server_port)
+    return server
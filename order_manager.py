@@ -1,13 +1,58 @@
 import time
 import logging
-import json
-from order_manager import OrderManager
-from trade_manager import TradeManager
-from firebase_client import stream_signal
-import config
+import uuid
+from functools import partial
+from exchange import DeltaExchangeClient
+from execution import plan_closes, run_batch
+from firebase_client import store_order
 
 logger = logging.getLogger(__name__)
 
+class OrderManager:
+    def __init__(self, account="MAIN"):
+        self.account = account
+        self.client = DeltaExchangeClient(account)
+        self.orders = {}
+
+    def place_order(self, symbol, side, amount, price, params=None, client_order_id=None):
+        try:
+            order = self.client.create_limit_order(symbol, side, amount, price, params, client_order_id)
+            order_id = order.get('id') or str(uuid.uuid4())
+            order_info = {
+                'id': order_id,
+                'client_order_id': order.get('clientOrderId', client_order_id),
+                'symbol': symbol,
+                'side': side,
+                'amount': amount,
+                'price': price,
+                'params': params or {},
+                'status': order.get('status', 'open'),
+                'timestamp': order.get('timestamp', int(time.time() * 1000))
+            }
+            self.orders[order_id] = order_info
+            store_order(self.account, order_id, order_info)
+            logger.info("Limit order placed: %s", order_info)
+            return order_info
+        except Exception as e:
+            logger.error("Error placing limit order for %s: %s", symbol, e)
+            raise
+
+    def attach_bracket_to_order(self, order_id, product_id, product_symbol, bracket_params):
+        order = self.client.modify_bracket_order(order_id, product_id, product_symbol, bracket_params)
+        if order_id in self.orders:
+            self.orders[order_id]['bracket'] = bracket_params
+        return order
+
+    def modify_bracket_order(self, order_id, new_stop_loss_order, product_id=27):
+        symbol = self.orders.get(order_id, {}).get('symbol', "BTCUSD")
+        bracket_params = {
+            "bracket_stop_loss_price": new_stop_loss_order["stop_price"],
+            "bracket_stop_loss_limit_price": new_stop_loss_order.get("limit_price", new_stop_loss_order["stop_price"]),
+            "bracket_stop_trigger_method": "last_traded_price"
+        }
+        return self.attach_bracket_to_order(order_id, product_id, symbol, bracket_params)
+
+
 class OrderHandler:
     def __init__(self, order_manager, trade_manager):
         self.order_manager = order_manager
@@ -29,7 +74,7 @@ class OrderHandler:
                 if new_side == "" or order_side != new_side.lower():
                     self._cancel_order(order['id'], symbol)
         except Exception as e:
-            logger.error(f"Error canceling conflicting orders: {e}")
+            logger.error("Error canceling conflicting orders: %s", e)
 
     def cancel_same_side_orders(self, symbol, side):
         try:
@@ -38,88 +83,110 @@ class OrderHandler:
                 if order.get('side', '').lower() == side.lower():
                     self._cancel_order(order['id'], symbol)
         except Exception as e:
-            logger.error(f"Error canceling same-side orders: {e}")
+            logger.error("Error canceling same-side orders: %s", e)
 
     def _cancel_order(self, order_id, symbol):
         try:
             self.order_manager.client.cancel_order(order_id, symbol)
-            logger.info(f"Canceled order: {order_id}")
+            logger.info("Canceled order: %s", order_id)
         except Exception as e:
-            logger.error(f"Error canceling order {order_id}: {e}")
+            logger.error("Error canceling order %s: %s", order_id, e)
 
     def pending_order_exists(self, symbol, side):
         try:
             orders = self.order_manager.client.exchange.fetch_open_orders(symbol)
             return any(order.get('side', '').lower() == side.lower() and order.get('status', '').lower() == 'open' for order in orders)
         except Exception as e:
-            logger.error(f"Error checking pending orders: {e}")
+            logger.error("Error checking pending orders: %s", e)
             return False
 
-    def place_limit_order(self, symbol, side, entry_price):
+    def place_limit_order(self, symbol, side, entry_price, client_order_id=None):
         try:
-            return self.order_manager.place_order(symbol, side, 1, entry_price, params={"time_in_force": "gtc"})
+            return self.order_manager.place_order(
+                symbol, side, 1, entry_price, params={"time_in_force": "gtc"}, client_order_id=client_order_id
+            )
         except Exception as e:
-            logger.error(f"Limit order failed: {e}")
+            logger.error("Limit order failed: %s", e)
             return None
 
     def attach_bracket(self, order_id, symbol, sl_price, tp_price):
+        client = self.order_manager.client
+        sl_price = client.price_to_precision(symbol, sl_price)
+        tp_price = client.price_to_precision(symbol, tp_price)
         bracket_params = {
-            "bracket_stop_loss_limit_price": str(sl_price),
-            "bracket_stop_loss_price": str(sl_price),
-            "bracket_take_profit_limit_price": str(tp_price),
-            "bracket_take_profit_price": str(tp_price),
+            "bracket_stop_loss_limit_price": sl_price,
+            "bracket_stop_loss_price": sl_price,
+            "bracket_take_profit_limit_price": tp_price,
+            "bracket_take_profit_price": tp_price,
             "bracket_stop_trigger_method": "last_traded_price"
         }
         try:
             return self.order_manager.attach_bracket_to_order(order_id, 27, symbol, bracket_params)
         except Exception as e:
-            logger.error(f"Bracket attachment failed: {e}")
+            logger.error("Bracket attachment failed: %s", e)
             return None
 
     def handle_take_profit(self, symbol):
+        """
+        Lock 50% of the profit of winning positions with a bracket stop and
+        close the losing ones.
+
+        Every action is decided from one price read before anything is sent;
+        the bracket updates and the (netted) closing order then go out
+        concurrently. Returns the per-action results and the wall time.
+        """
         try:
-            positions = self.order_manager.client.fetch_positions()
-            for pos in positions:
-                pos_symbol = pos.get('info', {}).get('product_symbol') or pos.get('symbol')
-                if not pos_symbol or symbol not in pos_symbol:
-                    continue
-
-                size = float(pos.get('size') or pos.get('contracts') or 0)
-                if size == 0:
-                    continue
-
-                entry = float(pos.get('entryPrice') or pos.get('entry_price') or pos.get('info', {}).get('entry_price'))
-                live_price = self.order_manager.client.exchange.fetch_ticker(symbol)['last']
-
-                profit_pct = ((live_price - entry) / entry) if size > 0 else ((entry - live_price) / entry)
-                profit_pct *= 100
-
-                if profit_pct > 0:
-                    stop_lock_price = entry + ((live_price - entry) * 0.5) if size > 0 else entry - ((entry - live_price) * 0.5)
-                    bracket_params = {
-                        "bracket_stop_loss_limit_price": str(stop_lock_price),
-                        "bracket_stop_loss_price": str(stop_lock_price),
-                        "bracket_stop_trigger_method": "last_traded_price"
-                    }
-                    self.order_manager.attach_bracket_to_order(pos.get('id'), 27, symbol, bracket_params)
-                    logger.info(f"Profit > 0: Locking 50%% of profit with SL at {stop_lock_price}")
-                else:
-                    logger.info("Profit < 0: Closing position due to take profit in loss.")
-                    side = "sell" if size > 0 else "buy"
-                    self.trade_manager.place_market_order(symbol, side, abs(size), params={"time_in_force": "ioc"})
-
+            positions = [p for p in self.order_manager.client.fetch_position_book().matching(symbol) if p.entry_price]
+            if not positions:
+                return [], 0.0
+            live_price = self.trade_manager.get_current_price(symbol)
+            read_at = int(time.time() * 1000)
+            calls = self._plan_take_profit(positions, symbol, live_price, read_at)
         except Exception as e:
-            logger.error(f"Position closing error during take profit: {e}")
+            logger.error("Position closing error during take profit: %s", e)
+            return [], 0.0
+
+        results, elapsed = run_batch("take_profit", calls)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error("Take profit action failed: %s", result)
+        return results, elapsed
+
+    def _plan_take_profit(self, positions, symbol, live_price, read_at):
+        calls = []
+        losing = []
+        for position in positions:
+            entry = position.entry_price
+            gain = live_price - entry if position.size > 0 else entry - live_price
+            if gain > 0:
+                stop_lock_price = entry + gain * 0.5 if position.size > 0 else entry - gain * 0.5
+                stop_lock_price = self.order_manager.client.price_to_precision(symbol, stop_lock_price)
+                logger.info("Profit > 0: Locking 50%% of profit on %s with SL at %s", position.id, stop_lock_price)
+                calls.append(partial(self._lock_profit, position.id, symbol, stop_lock_price))
+            else:
+                losing.append(position)
+        # Take profit has no signal to derive ids from; the price-read time
+        # tells one run's closes from the next.
+        for action in plan_closes(losing, "tp-close", read_at):
+            logger.info("Profit < 0: Closing %d position(s) due to take profit in loss.", len(action.positions))
+            calls.append(partial(
+                self.trade_manager.place_market_order, action.symbol, action.side, action.size,
+                params={"time_in_force": "ioc"}, client_order_id=action.client_order_id
+            ))
+        return calls
+
+    def _lock_profit(self, order_id, symbol, stop_price):
+        bracket_params = {
+            "bracket_stop_loss_limit_price": stop_price,
+            "bracket_stop_loss_price": stop_price,
+            "bracket_stop_trigger_method": "last_traded_price"
+        }
+        return self.order_manager.attach_bracket_to_order(order_id, 27, symbol, bracket_params)
 
     def has_open_position(self, symbol, side):
         try:
-            positions = self.order_manager.client.fetch_positions()
-            for pos in positions:
-                symbol_match = (pos.get('info', {}).get('product_symbol') or pos.get('symbol')) == symbol
-                size = float(pos.get('size') or pos.get('contracts') or 0)
-                if not symbol_match or size == 0:
-                    continue
-                return (side == "buy" and size > 0) or (side == "sell" and size < 0)
+            for position in self.order_manager.client.fetch_position_book().for_symbol(symbol):
+                return (side == "buy" and position.size > 0) or (side == "sell" and position.size < 0)
         except Exception as e:
             logger.error("Error checking open position: %s", e)
         return False
@@ -0,0 +1,384 @@
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+import requests
+import websocket
+import config
+import metrics
+
+logger = logging.getLogger(__name__)
+
+BOOK_UPDATES = metrics.counter("orderbook_updates_total", "Depth messages applied to local order books", ("venue",))
+BOOK_RESYNCS = metrics.counter("orderbook_resyncs_total", "Local order book resynchronisations", ("venue",))
+
+_streams = {}
+_lock = threading.Lock()
+
+
+class Quote:
+    """Top of book at one instant; derived values are computed on demand in O(1)."""
+
+    __slots__ = ("bid", "bid_size", "ask", "ask_size", "timestamp")
+
+    def __init__(self, bid, bid_size, ask, ask_size, timestamp):
+        self.bid = bid
+        self.bid_size = bid_size
+        self.ask = ask
+        self.ask_size = ask_size
+        self.timestamp = timestamp
+
+    @property
+    def spread(self):
+        return self.ask - self.bid
+
+    @property
+    def mid(self):
+        return (self.bid + self.ask) / 2
+
+    @property
+    def microprice(self):
+        """Mid weighted towards the side with less resting size."""
+        total = self.bid_size + self.ask_size
+        if total <= 0:
+            return self.mid
+        return (self.bid * self.ask_size + self.ask * self.bid_size) / total
+
+    def __repr__(self):
+        return "Quote(%s x %s / %s x %s)" % (self.bid, self.bid_size, self.ask, self.ask_size)
+
+
+class BookSide:
+    """
+    Price levels of one side held in two parallel sorted lists.
+
+    Keys are stored so the best level is always last (bids by price, asks by
+    negated price), which makes the best level an O(1) read and keeps most
+    inserts and deletes, which happen near the top of the book, close to the
+    end of the list.
+    """
+
+    __slots__ = ("sign", "keys", "sizes", "max_levels")
+
+    def __init__(self, is_bid, max_levels=None):
+        self.sign = 1.0 if is_bid else -1.0
+        self.keys = []
+        self.sizes = []
+        self.max_levels = max_levels or config.ORDERBOOK_MAX_LEVELS
+
+    def clear(self):
+        del self.keys[:]
+        del self.sizes[:]
+
+    def set(self, price, size):
+        key = self.sign * price
+        keys = self.keys
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            if size:
+                self.sizes[i] = size
+            else:
+                del keys[i]
+                del self.sizes[i]
+        elif size:
+            keys.insert(i, key)
+            self.sizes.insert(i, size)
+
+    def update(self, levels):
+        for price, size in levels:
+            self.set(float(price), float(size))
+        # Levels far from the top only grow the lists; trim them in batches.
+        excess = len(self.keys) - 2 * self.max_levels
+        if excess > 0:
+            del self.keys[:excess + self.max_levels]
+            del self.sizes[:excess + self.max_levels]
+
+    def best(self):
+        if not self.keys:
+            return None, 0.0
+        return self.sign * self.keys[-1], self.sizes[-1]
+
+    def levels(self, depth=10):
+        """Best ``depth`` levels as ``(price, size)``, best first."""
+        keys, sizes, sign = self.keys, self.sizes, self.sign
+        return [(sign * keys[i], sizes[i]) for i in range(len(keys) - 1, max(-1, len(keys) - 1 - depth), -1)]
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class OrderBook:
+    """
+    Incrementally maintained L2 book for one symbol on one venue.
+
+    Writers (one depth stream thread) call ``reset`` and ``apply``; after
+    each call the top of book is published as an immutable ``Quote`` in a
+    single attribute assignment, so readers on other threads get a
+    consistent best bid/ask without locking.
+    """
+
+    def __init__(self, venue, symbol, max_levels=None):
+        self.venue = venue
+        self.symbol = symbol
+        self.bids = BookSide(True, max_levels)
+        self.asks = BookSide(False, max_levels)
+        self.update_id = None
+        self.quote = None
+
+    def reset(self, bids, asks, update_id=None):
+        self.bids.clear()
+        self.asks.clear()
+        return self.apply(bids, asks, update_id)
+
+    def apply(self, bids, asks, update_id=None):
+        """Apply level changes (size 0 removes a level); returns False if the book is crossed."""
+        self.bids.update(bids)
+        self.asks.update(asks)
+        self.update_id = update_id
+        bid, bid_size = self.bids.best()
+        ask, ask_size = self.asks.best()
+        if bid is None or ask is None:
+            self.quote = None
+            return True
+        if bid >= ask:
+            self.quote = None
+            return False
+        self.quote = Quote(bid, bid_size, ask, ask_size, time.time())
+        return True
+
+    def invalidate(self):
+        self.quote = None
+        self.update_id = None
+
+    def fresh_quote(self, max_age=None):
+        """Latest quote if it is younger than ``max_age`` seconds, otherwise None."""
+        quote = self.quote
+        max_age = config.ORDERBOOK_MAX_AGE if max_age is None else max_age
+        if quote is None or time.time() - quote.timestamp > max_age:
+            return None
+        return quote
+
+    def best_bid(self):
+        quote = self.quote
+        return quote.bid if quote else None
+
+    def best_ask(self):
+        quote = self.quote
+        return quote.ask if quote else None
+
+    def spread(self):
+        quote = self.quote
+        return quote.spread if quote else None
+
+    def microprice(self):
+        quote = self.quote
+        return quote.microprice if quote else None
+
+
+class DepthStream:
+    """
+    Websocket consumer that keeps an ``OrderBook`` in sync with a venue.
+
+    The connection is reopened after any disconnect; ``resync`` drops the
+    local book and forces a fresh subscription, which is how sequence gaps
+    and crossed books are recovered from. Subclasses provide the URL,
+    subscription message and message handling.
+    """
+
+    venue = None
+    url = None
+
+    def __init__(self, symbol, book=None):
+        self.symbol = symbol
+        self.book = book or OrderBook(self.venue, symbol)
+        self._ws = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="%s-depth" % self.venue, daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stopped.set()
+        if self._ws:
+            self._ws.close()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._ws = websocket.WebSocketApp(
+                self.url,
+                on_open=self._on_open,
+                on_message=self._on_message,
+                on_error=self._on_error,
+            )
+            self._ws.run_forever(ping_interval=20, ping_timeout=10)
+            self.book.invalidate()
+            if not self._stopped.is_set():
+                logger.warning("%s depth stream for %s closed, reconnecting", self.venue, self.symbol)
+                self._stopped.wait(config.ORDERBOOK_RECONNECT_DELAY)
+
+    def _on_open(self, ws):
+        logger.info("%s depth stream for %s opened", self.venue, self.symbol)
+        ws.send(json.dumps(self.subscribe_message()))
+
+    def _on_message(self, ws, message):
+        try:
+            self.handle(json.loads(message))
+        except Exception as e:
+            logger.error("Error processing %s depth message: %s", self.venue, e)
+            self.resync()
+
+    def _on_error(self, ws, error):
+        logger.error("%s depth stream error: %s", self.venue, error)
+
+    def resync(self):
+        BOOK_RESYNCS.labels(self.venue).inc()
+        self.book.invalidate()
+        if self._ws:
+            self._ws.close()
+
+    def subscribe_message(self):
+        raise NotImplementedError
+
+    def handle(self, data):
+        raise NotImplementedError
+
+
+class BinanceDepthStream(DepthStream):
+    """
+    Binance USD-M futures ``@depth`` diff stream.
+
+    Follows Binance's sync procedure: fetch a REST snapshot, drop events
+    older than it, require the first event to straddle the snapshot's
+    ``lastUpdateId``, then require each event's ``pu`` to equal the previous
+    event's ``u``.
+    """
+
+    venue = "binance"
+    url = config.BINANCE_WS_URL
+
+    def __init__(self, symbol, book=None):
+        super().__init__(symbol, book)
+        self.stream_symbol = config.BINANCE_SYMBOLS.get(symbol, symbol).lower()
+        self._snapshot_id = None
+
+    def resync(self):
+        self._snapshot_id = None
+        super().resync()
+
+    def subscribe_message(self):
+        self._snapshot_id = None
+        return {"method": "SUBSCRIBE", "params": ["%s@depth@100ms" % self.stream_symbol], "id": 1}
+
+    def fetch_snapshot(self):
+        response = requests.get(
+            config.BINANCE_DEPTH_SNAPSHOT_URL,
+            params={"symbol": self.stream_symbol.upper(), "limit": config.ORDERBOOK_MAX_LEVELS},
+            timeout=config.REST_TIMEOUT_MS / 1000.0,
+        )
+        response.raise_for_status()
+        snapshot = response.json()
+        self.book.reset(snapshot["bids"], snapshot["asks"])
+        self.book.invalidate()  # nothing is published until the first diff lines up
+        return snapshot["lastUpdateId"]
+
+    def handle(self, data):
+        if data.get("e") != "depthUpdate":
+            return
+        book = self.book
+        if book.update_id is None:
+            if self._snapshot_id is None:
+                self._snapshot_id = self.fetch_snapshot()
+            if data["u"] < self._snapshot_id:
+                return
+            if data["U"] > self._snapshot_id:
+                logger.warning("Binance depth snapshot for %s is stale, refetching", self.symbol)
+                self._snapshot_id = None
+                return
+            self._snapshot_id = None
+        elif data["pu"] != book.update_id:
+            logger.warning("Binance depth gap for %s (%s != %s), resyncing", self.symbol, data["pu"], book.update_id)
+            self.resync()
+            return
+
+        BOOK_UPDATES.labels(self.venue).inc()
+        if not book.apply(data["b"], data["a"], data["u"]):
+            logger.warning("Binance book for %s crossed, resyncing", self.symbol)
+            self.resync()
+
+
+class DeltaDepthStream(DepthStream):
+    """
+    Delta Exchange ``l2_updates`` channel.
+
+    Delta sends a full snapshot on subscription followed by incremental
+    updates carrying a ``sequence_no``; a gap means updates were lost and
+    the channel is resubscribed.
+    """
+
+    venue = "delta"
+    url = config.DELTA_WS_URL
+
+    def subscribe_message(self):
+        return {"type": "subscribe",
+                "payload": {"channels": [{"name": "l2_updates", "symbols": [self.symbol]}]}}
+
+    def handle(self, data):
+        if data.get("type") != "l2_updates" or data.get("symbol") != self.symbol:
+            return
+        book = self.book
+        sequence = data.get("sequence_no")
+        action = data.get("action")
+        if action == "snapshot":
+            ok = book.reset(data.get("bids") or (), data.get("asks") or (), sequence)
+        elif action == "update":
+            if book.update_id is None:
+                return
+            if sequence is not None and sequence != book.update_id + 1:
+                logger.warning("Delta depth gap for %s (%s after %s), resyncing", self.symbol, sequence, book.update_id)
+                self.resync()
+                return
+            ok = book.apply(data.get("bids") or (), data.get("asks") or (), sequence)
+        else:
+            return
+
+        BOOK_UPDATES.labels(self.venue).inc()
+        if not ok:
+            logger.warning("Delta book for %s crossed, resyncing", self.symbol)
+            self.resync()
+
+
+STREAMS = {
+    "binance": BinanceDepthStream,
+    "delta": DeltaDepthStream,
+}
+
+
+def get_book(venue, symbol):
+    stream = _streams.get((venue, symbol))
+    return stream.book if stream else None
+
+
+def start_stream(venue, symbol):
+    """Start (once) the depth stream for ``symbol`` on ``venue`` and return it."""
+    with _lock:
+        stream = _streams.get((venue, symbol))
+        if stream is None:
+            stream = _streams[(venue, symbol)] = STREAMS[venue](symbol)
+            stream.start()
+        return stream
+
+
+if __name__ == "__main__":
+    import sys
+    venue = sys.argv[1] if len(sys.argv) > 1 else "delta"
+    book = start_stream(venue, "BTCUSD").book
+    while True:
+        quote = book.quote
+        if quote:
+            print("%s bid %s ask %s spread %s microprice %.2f" % (
+                venue, quote.bid, quote.ask, quote.spread, quote.microprice))
+        time.sleep(2)
@@ -0,0 +1,155 @@
+import logging
+import numpy as np
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class PortfolioSnapshot:
+    """
+    Result of one ``Portfolio.evaluate`` call.
+
+    Per-row arrays follow ``Portfolio.ids``; ``*_by_symbol`` and
+    ``*_by_account`` are indexed like ``Portfolio.symbols`` and
+    ``Portfolio.accounts``. Money values are in USD; use ``convert`` for
+    other currencies.
+
+    Rows without an entry price or a live price have NaN ``pnl`` (and NaN
+    ``notional`` without a live price); they are left out of the totals
+    and flagged in ``excluded``.
+    """
+
+    __slots__ = (
+        "ids", "accounts", "symbols", "live", "pnl", "pct", "notional", "excluded",
+        "pnl_by_symbol", "exposure_by_symbol", "pnl_by_account", "exposure_by_account",
+    )
+
+    def __init__(self, **columns):
+        for name in self.__slots__:
+            setattr(self, name, columns[name])
+
+    @staticmethod
+    def convert(values, currency):
+        return values * config.FX_RATES[currency]
+
+    def excluded_ids(self):
+        """Ids of the positions left out of the totals."""
+        return [self.ids[i] for i in np.flatnonzero(self.excluded)]
+
+    def symbol_totals(self):
+        return {s: (float(self.pnl_by_symbol[i]), float(self.exposure_by_symbol[i]))
+                for i, s in enumerate(self.symbols)}
+
+    def account_totals(self):
+        return {a: (float(self.pnl_by_account[i]), float(self.exposure_by_account[i]))
+                for i, a in enumerate(self.accounts)}
+
+
+class Portfolio:
+    """
+    Positions of several accounts held as NumPy columns.
+
+    Each account's rows are replaced whenever its positions are refreshed;
+    ``evaluate`` then prices every row against a per-symbol price table and
+    aggregates PnL and exposure per symbol and account with ``bincount``,
+    with no per-position Python work.
+    """
+
+    def __init__(self):
+        self.symbols = []
+        self.accounts = []
+        self._symbol_index = {}
+        self._account_index = {}
+        self._rows = {}
+        self._columns = None
+        self._contract_values = np.zeros(0)
+
+    def symbol_index(self, symbol):
+        index = self._symbol_index.get(symbol)
+        if index is None:
+            index = self._symbol_index[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+            value = config.CONTRACT_VALUES.get(symbol, config.DEFAULT_CONTRACT_VALUE)
+            self._contract_values = np.append(self._contract_values, value)
+        return index
+
+    def account_index(self, account):
+        index = self._account_index.get(account)
+        if index is None:
+            index = self._account_index[account] = len(self.accounts)
+            self.accounts.append(account)
+        return index
+
+    def update_account(self, account, positions):
+        """Replace ``account``'s rows with ``positions`` (``positions.Position`` records)."""
+        count = len(positions)
+        ids = [p.id for p in positions]
+        entry = np.fromiter((p.entry_price or np.nan for p in positions), np.float64, count)
+        size = np.fromiter((p.size for p in positions), np.float64, count)
+        symbol = np.fromiter((self.symbol_index(p.symbol) for p in positions), np.int32, count)
+        self._rows[self.account_index(account)] = (ids, entry, size, symbol)
+        self._columns = None
+
+    def _build_columns(self):
+        ids, entry, size, symbol, account = [], [], [], [], []
+        for account_index, (row_ids, row_entry, row_size, row_symbol) in self._rows.items():
+            ids.extend(row_ids)
+            entry.append(row_entry)
+            size.append(row_size)
+            symbol.append(row_symbol)
+            account.append(np.full(len(row_ids), account_index, np.int32))
+        if not ids:
+            empty_f, empty_i = np.zeros(0), np.zeros(0, np.int32)
+            return ids, empty_f, empty_f, empty_i, empty_i
+        return (ids, np.concatenate(entry), np.concatenate(size),
+                np.concatenate(symbol), np.concatenate(account))
+
+    @property
+    def ids(self):
+        if self._columns is None:
+            self._columns = self._build_columns()
+        return self._columns[0]
+
+    def price_table(self, prices):
+        """Map ``{symbol: price}`` onto an array indexed by symbol; missing prices are NaN."""
+        table = np.full(len(self.symbols), np.nan)
+        for symbol, price in prices.items():
+            index = self._symbol_index.get(symbol)
+            if index is not None and price is not None:
+                table[index] = price
+        return table
+
+    def evaluate(self, prices):
+        if isinstance(prices, dict):
+            prices = self.price_table(prices)
+        if self._columns is None:
+            self._columns = self._build_columns()
+        ids, entry, size, symbol, account = self._columns
+
+        live = prices[symbol]
+        contract_value = self._contract_values[symbol]
+        diff = live - entry
+        with np.errstate(invalid="ignore", divide="ignore"):
+            pct = np.sign(size) * diff / entry
+        pnl = diff * size * contract_value
+        signed_notional = size * contract_value * live
+        pnl_known = np.isfinite(pnl)
+        notional_known = np.isfinite(signed_notional)
+        pnl_weights = np.where(pnl_known, pnl, 0.0)
+        exposure_weights = np.where(notional_known, signed_notional, 0.0)
+
+        n_symbols, n_accounts = len(self.symbols), len(self.accounts)
+        return PortfolioSnapshot(
+            ids=ids,
+            accounts=self.accounts,
+            symbols=self.symbols,
+            live=live,
+            pnl=pnl,
+            pct=pct,
+            notional=np.abs(signed_notional),
+            excluded=~(pnl_known & notional_known),
+            pnl_by_symbol=np.bincount(symbol, weights=pnl_weights, minlength=n_symbols),
+            exposure_by_symbol=np.bincount(symbol, weights=exposure_weights, minlength=n_symbols),
+            pnl_by_account=np.bincount(account, weights=pnl_weights, minlength=n_accounts),
+            exposure_by_account=np.bincount(account, weights=exposure_weights, minlength=n_accounts),
+        )
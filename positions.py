@@ -0,0 +1,91 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _to_float(value, default=None):
+    if value is None or value == "":
+        return default
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class Position:
+    """
+    A position parsed once from a raw ccxt/Delta position dict.
+
+    ``size`` is signed: positive for longs, negative for shorts. ccxt's
+    ``contracts`` is unsigned, so the sign comes from Delta's raw
+    ``info.size`` when present, otherwise from ``side``.
+    """
+
+    __slots__ = ("id", "symbol", "size", "entry_price", "raw")
+
+    def __init__(self, id, symbol, size, entry_price, raw=None):
+        self.id = id
+        self.symbol = symbol
+        self.size = size
+        self.entry_price = entry_price
+        self.raw = raw
+
+    @classmethod
+    def from_ccxt(cls, pos):
+        info = pos.get('info') or {}
+        symbol = info.get('product_symbol') or pos.get('symbol')
+
+        size = _to_float(pos.get('size'))
+        if size is None:
+            size = _to_float(info.get('size'))
+        if size is None:
+            size = _to_float(pos.get('contracts'), 0.0)
+            if pos.get('side') == 'short' and size > 0:
+                size = -size
+
+        entry = _to_float(pos.get('entryPrice') or pos.get('entry_price') or info.get('entry_price'))
+        return cls(pos.get('id'), symbol, size, entry, pos)
+
+    @property
+    def is_long(self):
+        return self.size > 0
+
+    @property
+    def close_side(self):
+        return "sell" if self.size > 0 else "buy"
+
+    def __repr__(self):
+        return "Position(id=%r, symbol=%r, size=%r, entry_price=%r)" % (
+            self.id, self.symbol, self.size, self.entry_price)
+
+
+class PositionBook:
+    """Open (non-zero) positions from one fetch, indexed by product symbol."""
+
+    __slots__ = ("positions", "by_symbol")
+
+    def __init__(self, positions):
+        self.positions = [p for p in positions if p.size and p.symbol]
+        self.by_symbol = {}
+        for position in self.positions:
+            self.by_symbol.setdefault(position.symbol, []).append(position)
+
+    @classmethod
+    def from_ccxt(cls, raw_positions):
+        return cls([Position.from_ccxt(pos) for pos in raw_positions or ()])
+
+    def for_symbol(self, symbol):
+        return self.by_symbol.get(symbol, [])
+
+    def matching(self, symbol):
+        """Positions whose product symbol contains ``symbol`` (e.g. ``BTCUSD``)."""
+        exact = self.by_symbol.get(symbol)
+        if exact is not None and len(self.by_symbol) == 1:
+            return exact
+        return [p for key, group in self.by_symbol.items() if symbol in key for p in group]
+
+    def __iter__(self):
+        return iter(self.positions)
+
+    def __len__(self):
+        return len(self.positions)
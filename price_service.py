@@ -0,0 +1,145 @@
+import threading
+import time
+import logging
+import config
+import binance_ws
+
+logger = logging.getLogger(__name__)
+
+
+def _binance_feed(symbol):
+    if "BTCUSD" not in symbol:
+        return None
+    return binance_ws.current_price, binance_ws.last_update
+
+
+# Source of streamed prices: feed(symbol) -> (price, timestamp) or None.
+# Account worker processes point this at the shared price table.
+feed = _binance_feed
+
+
+def set_feed(source):
+    global feed
+    feed = source
+
+
+class _Flight:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class PriceService:
+    """
+    Last-price lookups shared by all order paths.
+
+    Prices come from the streamed feed (the Binance websocket, or the shared
+    price table in account worker processes) while it is fresh, then from a
+    short-TTL cache, and only then from REST. Many symbols are fetched with a
+    single ``fetch_tickers`` call, and concurrent callers asking for the same
+    symbols wait on one in-flight request instead of issuing their own.
+    """
+
+    def __init__(self, client, ttl=None, feed_max_age=None):
+        self.client = client
+        self.ttl = config.PRICE_CACHE_TTL if ttl is None else ttl
+        self.feed_max_age = config.PRICE_FEED_MAX_AGE if feed_max_age is None else feed_max_age
+        self._cache = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def get_price(self, symbol):
+        price = self._feed_price(symbol)
+        if price is not None:
+            return price
+        return self.get_prices([symbol])[symbol]
+
+    def get_prices(self, symbols):
+        prices = {}
+        missing = []
+        now = time.monotonic()
+        for symbol in dict.fromkeys(symbols):
+            price = self._feed_price(symbol)
+            if price is None:
+                cached = self._cache.get(symbol)
+                if cached and now - cached[1] < self.ttl:
+                    price = cached[0]
+            if price is None:
+                missing.append(symbol)
+            else:
+                prices[symbol] = price
+
+        if missing:
+            prices.update(self._single_flight(tuple(sorted(missing))))
+        return prices
+
+    def invalidate(self, symbol=None):
+        if symbol is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(symbol, None)
+
+    def _feed_price(self, symbol):
+        entry = feed(symbol)
+        if entry is None:
+            return None
+        price, updated = entry
+        if not price or updated is None or time.time() - updated > self.feed_max_age:
+            return None
+        return price
+
+    def _single_flight(self, symbols):
+        with self._lock:
+            flight = self._inflight.get(symbols)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[symbols] = _Flight()
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = self._fetch(symbols)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(symbols, None)
+            flight.event.set()
+
+    def _fetch(self, symbols):
+        try:
+            if len(symbols) == 1:
+                tickers = {symbols[0]: self.client.exchange.fetch_ticker(symbols[0])}
+            else:
+                # fetch_tickers keys its result by unified symbol
+                # ("BTC/USD:USD") whatever form the request used.
+                keys = {symbol: self._unified(symbol) for symbol in symbols}
+                tickers = self.client.exchange.fetch_tickers(list(symbols))
+                tickers = {symbol: tickers.get(key) for symbol, key in keys.items()}
+        except Exception as e:
+            logger.error("Error fetching tickers for %s: %s", symbols, e)
+            raise
+
+        now = time.monotonic()
+        prices = {}
+        for symbol in symbols:
+            ticker = tickers.get(symbol)
+            if not ticker or ticker.get('last') is None:
+                raise KeyError("No ticker price returned for %s" % symbol)
+            price = float(ticker['last'])
+            self._cache[symbol] = (price, now)
+            prices[symbol] = price
+        return prices
+
+    def _unified(self, symbol):
+        market = self.client.market(symbol)
+        return market['symbol'] if market else symbol
@@ -1,45 +1,38 @@
 import time
 import logging
+import numpy as np
 from exchange import DeltaExchangeClient
 import config
+import settings
 import binance_ws
 from trade_manager import TradeManager
+from portfolio import Portfolio
+from execution import client_order_id
+import metrics
+import reconciler
 
 logger = logging.getLogger(__name__)
 
+TRAILING_EVALUATIONS = metrics.counter("trailing_evaluations_total", "Per-position trailing stop evaluations")
+TRAILING_CLOSES = metrics.counter("trailing_stop_closes_total", "Positions closed by a triggered trailing stop")
+
 class PositionTracker:
-    def __init__(self, client):
-        self.client = client
+    def __init__(self, reconciler):
+        self.reconciler = reconciler
 
     def get_valid_positions(self):
-        try:
-            positions = self.client.fetch_positions()
-            return [pos for pos in positions if self._is_valid_position(pos)]
-        except Exception as e:
-            logger.error("Position fetch error: %s", e)
+        state = self.reconciler.snapshot(config.RECONCILE_MAX_AGE)
+        if state is None:
             return []
-
-    def _is_valid_position(self, position):
-        size = self._get_position_size(position)
-        if size == 0:
-            return False
-        symbol = position.get('info', {}).get('product_symbol') or position.get('symbol')
-        return symbol and "BTCUSD" in symbol
-
-    def _get_position_size(self, position):
-        size_str = position.get('size') or position.get('contracts') or "0"
-        try:
-            return float(size_str)
-        except ValueError:
-            return 0.0
+        return state.positions.matching("BTCUSD")
 
 class ProfitCalculator:
     @staticmethod
     def calculate_profit(position, live_price):
-        entry = ProfitCalculator._get_entry_price(position)
-        size = ProfitCalculator._get_position_size(position)
+        entry = position.entry_price
+        size = position.size
 
-        if entry is None or size == 0:
+        if not entry or size == 0:
             return None
 
         return {
@@ -47,24 +40,6 @@ class ProfitCalculator:
             'raw': ProfitCalculator._raw_profit(entry, size, live_price)
         }
 
-    @staticmethod
-    def _get_entry_price(position):
-        entry = (position.get('entryPrice')
-                 or position.get('entry_price')
-                 or position.get('info', {}).get('entry_price'))
-        try:
-            return float(entry)
-        except (TypeError, ValueError):
-            return None
-
-    @staticmethod
-    def _get_position_size(position):
-        size_str = position.get('size') or position.get('contracts') or "0"
-        try:
-            return float(size_str)
-        except ValueError:
-            return 0.0
-
     @staticmethod
     def _profit_percentage(entry, size, live_price):
         if size > 0:
@@ -78,63 +53,76 @@ class ProfitCalculator:
         return (entry - live_price) * abs(size)
 
 class ProfitTrailing:
-    def __init__(self, check_interval):
-        self.client = DeltaExchangeClient()
-        self.tracker = PositionTracker(self.client)
-        self.trade_manager = TradeManager()
+    def __init__(self, check_interval, account="MAIN", price_source=None):
+        self.account = account
+        self.client = DeltaExchangeClient(account)
+        self.reconciler = reconciler.for_account(self.client, account)
+        self.reconciler.subscribe(self._on_position_changes, (reconciler.POSITION,))
+        self.tracker = PositionTracker(self.reconciler)
+        self.trade_manager = TradeManager(account)
         self.check_interval = check_interval
+        # Callable returning the live price; defaults to this process's Binance feed
+        self.price_source = price_source
         self.position_trailing_stop = {}
-        self.trailing_config = config.PROFIT_TRAILING_CONFIG
-
-    def _get_trailing_rule(self, profit_pct):
-        if profit_pct < self.trailing_config["start_trailing_profit_pct"]:
-            return None
-        return next((level for level in reversed(self.trailing_config["levels"])
-                     if profit_pct >= level["min_profit_pct"]), None)
-
-    def _calculate_trailing_stop(self, entry, size, profit_pct, rule):
-        if not rule or profit_pct < self.trailing_config["start_trailing_profit_pct"]:
-            return self._fixed_stop_price(entry, size)
-        if rule["trailing_stop_offset"]:
+        self.portfolio = Portfolio()
+
+    def _on_position_changes(self, changes):
+        # Stops are keyed like the reconciler's changes. A closed position
+        # drops its stop; so does one reopened (new entry or side) between
+        # two syncs, which shows up as a change rather than a removal.
+        for change in changes:
+            old, new = change.old, change.new
+            if new is None or (old is not None and (
+                    old.entry_price != new.entry_price or (old.size > 0) != (new.size > 0))):
+                self.position_trailing_stop.pop(change.key, None)
+
+    def _calculate_trailing_stop(self, trailing, entry, size, profit_pct, rule):
+        if not rule or profit_pct < trailing.start_trailing_profit_pct:
+            return self._fixed_stop_price(trailing, entry, size)
+        if rule.trailing_stop_offset:
             return self._dynamic_stop_price(entry, size, rule)
         return self._partial_booking_price(entry, profit_pct, rule, size)
 
-    def _fixed_stop_price(self, entry, size):
-        fixed_sl = self.trailing_config["fixed_stop_loss_pct"]
+    def _fixed_stop_price(self, trailing, entry, size):
+        fixed_sl = trailing.fixed_stop_loss_pct
         return entry * (1 - fixed_sl) if size > 0 else entry * (1 + fixed_sl)
 
     def _dynamic_stop_price(self, entry, size, rule):
-        offset = rule["trailing_stop_offset"]
+        offset = rule.trailing_stop_offset
         return entry * (1 + offset) if size > 0 else entry * (1 - offset)
 
     def _partial_booking_price(self, entry, profit_pct, rule, size):
-        fraction = rule.get("book_fraction", 1.0)
+        fraction = rule.book_fraction
         return entry * (1 + profit_pct * fraction) if size > 0 else entry * (1 - profit_pct * fraction)
 
-    def _update_stored_stop(self, order_id, new_stop, size):
-        current_stop = self.position_trailing_stop.get(order_id)
+    def _update_stored_stop(self, key, new_stop, size):
+        current_stop = self.position_trailing_stop.get(key)
         if current_stop is None:
-            self.position_trailing_stop[order_id] = new_stop
+            self.position_trailing_stop[key] = new_stop
             return new_stop
         improved_stop = max(current_stop, new_stop) if size > 0 else min(current_stop, new_stop)
-        self.position_trailing_stop[order_id] = improved_stop
+        self.position_trailing_stop[key] = improved_stop
         return improved_stop
 
     def _should_trigger_stop(self, size, live_price, trailing_stop):
         return live_price < trailing_stop if size > 0 else live_price > trailing_stop
 
-    def _close_position(self, symbol, size):
+    def _close_position(self, symbol, size, client_order_id=None):
         side = "sell" if size > 0 else "buy"
         qty = abs(size)
-        close_order = self.trade_manager.place_market_order(symbol, side, qty, params={"time_in_force": "ioc"})
+        close_order = self.trade_manager.place_market_order(
+            symbol, side, qty, params={"time_in_force": "ioc"}, client_order_id=client_order_id
+        )
         logger.info("Closed %s position: %s", side, close_order)
+        self.reconciler.poke()
         return close_order
 
     def _update_bracket_order(self, order_id, trailing_stop):
         try:
+            stop_price = self.client.price_to_precision("BTCUSD", trailing_stop)
             bracket_params = {
-                "bracket_stop_loss_limit_price": str(trailing_stop),
-                "bracket_stop_loss_price": str(trailing_stop),
+                "bracket_stop_loss_limit_price": stop_price,
+                "bracket_stop_loss_price": stop_price,
                 "bracket_stop_trigger_method": "last_traded_price"
             }
             return self.trade_manager.order_manager.attach_bracket_to_order(
@@ -145,9 +133,11 @@ class ProfitTrailing:
             return None
 
     def _handle_profit_booking(self, position, live_price):
-        order_id = position.get('id')
-        size = self.tracker._get_position_size(position)
-        entry = ProfitCalculator._get_entry_price(position)
+        TRAILING_EVALUATIONS.inc()
+        order_id = position.id
+        key = reconciler.position_key(position)
+        size = position.size
+        entry = position.entry_price
         if not entry or size == 0:
             return False
 
@@ -155,46 +145,52 @@ class ProfitTrailing:
         if not profit_data:
             return False
 
-        rule = self._get_trailing_rule(profit_data['percentage'])
-        trailing_stop = self._calculate_trailing_stop(entry, size, profit_data['percentage'], rule)
-        final_stop = self._update_stored_stop(order_id, trailing_stop, size)
+        # One settings read per evaluation, so a reload never mixes two configs
+        trailing = settings.current().trailing
+        rule = trailing.rule_for(profit_data['percentage'])
+        trailing_stop = self._calculate_trailing_stop(trailing, entry, size, profit_data['percentage'], rule)
+        final_stop = self._update_stored_stop(key, trailing_stop, size)
 
         if self._should_trigger_stop(size, live_price, final_stop):
-            self._close_position("BTCUSD", size)
+            self._close_position("BTCUSD", size, client_order_id("trail-close", order_id, size, entry))
+            TRAILING_CLOSES.inc()
             return True
 
-        if rule and rule.get("book_fraction"):
+        if rule and rule.book_fraction:
             self._update_bracket_order(order_id, final_stop)
         return False
 
-    def _display_position_status(self, position, live_price):
-        profit_data = ProfitCalculator.calculate_profit(position, live_price)
-        entry = ProfitCalculator._get_entry_price(position)
-        size = self.tracker._get_position_size(position)
-        trailing_stop = self.position_trailing_stop.get(position.get('id'))
-        profit_usd = profit_data['raw'] / 1000 if profit_data else None
-        profit_inr = profit_usd * 85 if profit_usd else None
-
-        logger.info(
-            "Order: %s | Size: %s | Entry: %.2f | Live: %.2f | Profit: %.2f%% | USD: %.2f | INR: %.2f | Stop: %.2f",
-            position.get('id'), size, entry, live_price,
-            profit_data['percentage'] * 100 if profit_data else 0,
-            profit_usd or 0,
-            profit_inr or 0,
-            trailing_stop or 0
-        )
+    def _display_portfolio_status(self, positions, live_price):
+        self.portfolio.update_account(self.account, positions)
+        snapshot = self.portfolio.evaluate({position.symbol: live_price for position in positions})
+        pct = np.nan_to_num(snapshot.pct) * 100
+        profit_usd = np.nan_to_num(snapshot.pnl)
+        profit_inr = snapshot.convert(profit_usd, "INR")
+
+        for i, position in enumerate(positions):
+            logger.info(
+                "Order: %s | Size: %s | Entry: %.2f | Live: %.2f | Profit: %.2f%% | USD: %.2f | INR: %.2f | Stop: %.2f",
+                position.id, position.size, position.entry_price or 0, live_price,
+                pct[i], profit_usd[i], profit_inr[i],
+                self.position_trailing_stop.get(reconciler.position_key(position)) or 0
+            )
+        if snapshot.excluded.any():
+            logger.warning("Positions left out of PnL totals (no entry or live price): %s", snapshot.excluded_ids())
+        return snapshot
+
+    def _live_price(self):
+        if self.price_source is not None:
+            return self.price_source()
+        return binance_ws.current_price
 
     def track(self):
-        binance_ws.run_in_thread()
+        if self.price_source is None:
+            binance_ws.run_in_thread()
         self._wait_for_price_initialization()
-        last_refresh = time.time()
+        self.reconciler.start()
 
         while True:
-            live_price = binance_ws.current_price
-
-            if time.time() - last_refresh > 300:
-                self.position_trailing_stop.clear()
-                last_refresh = time.time()
+            live_price = self._live_price()
 
             if live_price:
                 positions = self.tracker.get_valid_positions()
@@ -203,8 +199,8 @@ class ProfitTrailing:
                     time.sleep(self.check_interval)
                     continue
 
+                self._display_portfolio_status(positions, live_price)
                 for position in positions:
-                    self._display_position_status(position, live_price)
                     self._handle_profit_booking(position, live_price)
 
             time.sleep(self.check_interval)
@@ -212,7 +208,7 @@ class ProfitTrailing:
     def _wait_for_price_initialization(self):
         timeout = 30
         start = time.time()
-        while not binance_ws.current_price:
+        while not self._live_price():
             if time.time() - start > timeout:
                 logger.error("Price feed unavailable")
                 return
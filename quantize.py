@@ -0,0 +1,162 @@
+import math
+import logging
+import time
+from decimal import Decimal
+import config
+
+logger = logging.getLogger(__name__)
+
+ROUND_NEAREST = "nearest"
+ROUND_DOWN = "down"
+ROUND_UP = "up"
+
+# Guards against float division landing just below an exact tick multiple,
+# e.g. 0.3 / 0.1 == 2.9999999999999996.
+_EPSILON = 1e-9
+
+
+class Step:
+    """
+    A tick or lot size held as an integer number of units at a fixed scale.
+
+    The step is parsed once with ``Decimal``; after that every conversion is
+    integer tick arithmetic and plain string formatting.
+    """
+
+    __slots__ = ("size", "decimals", "units", "scale", "_inv")
+
+    def __init__(self, size):
+        step = Decimal(str(size)).normalize()
+        if step <= 0:
+            raise ValueError("Step size must be positive: %s" % size)
+        exponent = step.as_tuple().exponent
+        self.decimals = max(0, -exponent)
+        self.scale = 10 ** self.decimals
+        self.units = int(step * self.scale)
+        self.size = float(step)
+        self._inv = 1.0 / self.size
+
+    def to_steps(self, value, mode=ROUND_NEAREST):
+        x = float(value) * self._inv
+        if mode == ROUND_DOWN:
+            return math.floor(x + _EPSILON)
+        if mode == ROUND_UP:
+            return math.ceil(x - _EPSILON)
+        return math.floor(x + 0.5)
+
+    def to_float(self, steps):
+        return steps * self.units / self.scale
+
+    def to_str(self, steps):
+        units = steps * self.units
+        if not self.decimals:
+            return str(units)
+        sign = ""
+        if units < 0:
+            sign = "-"
+            units = -units
+        whole, frac = divmod(units, self.scale)
+        return "%s%d.%0*d" % (sign, whole, self.decimals, frac)
+
+    def round(self, value, mode=ROUND_NEAREST):
+        return self.to_float(self.to_steps(value, mode))
+
+    def format(self, value, mode=ROUND_NEAREST):
+        return self.to_str(self.to_steps(value, mode))
+
+
+class SymbolQuantizer:
+    __slots__ = ("symbol", "tick", "lot")
+
+    def __init__(self, symbol, tick_size, lot_size):
+        self.symbol = symbol
+        self.tick = Step(tick_size)
+        self.lot = Step(lot_size)
+
+    def price(self, value, mode=ROUND_NEAREST):
+        return self.tick.round(value, mode)
+
+    def price_str(self, value, mode=ROUND_NEAREST):
+        return self.tick.format(value, mode)
+
+    def amount(self, value):
+        return self.lot.round(value, ROUND_DOWN)
+
+    def amount_str(self, value):
+        return self.lot.format(value, ROUND_DOWN)
+
+
+class Quantizer:
+    """
+    Per-symbol tick/lot quantizers built from the client's cached markets.
+
+    Markets are indexed by both unified symbol (``BTC/USD:USD``) and exchange
+    id (``BTCUSD``). Symbols missing from the markets fall back to
+    ``config.DEFAULT_TICK_SIZE`` and ``config.DEFAULT_LOT_SIZE``; the
+    fallback is kept for ``config.PRECISION_RETRY_INTERVAL`` seconds, after
+    which the real market is tried again.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self._symbols = {}
+        self._fallbacks = {}
+
+    def get(self, symbol):
+        quantizer = self._symbols.get(symbol)
+        if quantizer is None:
+            fallback = self._fallbacks.get(symbol)
+            if fallback and time.monotonic() < fallback[1]:
+                return fallback[0]
+            quantizer = self._build(symbol)
+            if quantizer is None:
+                quantizer = SymbolQuantizer(symbol, config.DEFAULT_TICK_SIZE, config.DEFAULT_LOT_SIZE)
+                self._fallbacks[symbol] = (quantizer, time.monotonic() + config.PRECISION_RETRY_INTERVAL)
+                return quantizer
+            self._fallbacks.pop(symbol, None)
+            self._symbols[symbol] = quantizer
+        return quantizer
+
+    def clear(self):
+        self._symbols.clear()
+        self._fallbacks.clear()
+
+    def _build(self, symbol):
+        market = None
+        try:
+            market = self.client.market(symbol)
+        except Exception as e:
+            logger.error("Error loading markets for %s precision: %s", symbol, e)
+
+        if not market:
+            logger.warning("No market precision for %s, using defaults", symbol)
+            return None
+
+        info = market.get('info') or {}
+        precision = market.get('precision') or {}
+        tick = info.get('tick_size') or precision.get('price') or config.DEFAULT_TICK_SIZE
+        lot = precision.get('amount') or config.DEFAULT_LOT_SIZE
+        return SymbolQuantizer(symbol, tick, lot)
+
+
+if __name__ == "__main__":
+    import timeit
+    from decimal import ROUND_HALF_UP
+
+    tick = SymbolQuantizer("BTCUSD", "0.5", "1")
+    prices = [84123.45 + i * 0.013 for i in range(1000)]
+    tick_dec = Decimal("0.5")
+
+    def current():
+        return [str(round(p, 2)) for p in prices]
+
+    def decimal_quantize():
+        return [str((Decimal(repr(p)) / tick_dec).quantize(Decimal(1), ROUND_HALF_UP) * tick_dec) for p in prices]
+
+    def quantized():
+        return [tick.price_str(p) for p in prices]
+
+    print("Sample:", prices[0], "->", current()[0], "|", quantized()[0])
+    for name, fn in (("str(round(x, 2))", current), ("Decimal", decimal_quantize), ("Step", quantized)):
+        best = min(timeit.repeat(fn, number=100, repeat=5))
+        print("%-18s %.3f us/price" % (name, best / (100 * len(prices)) * 1e6))
@@ -0,0 +1,252 @@
+import logging
+import threading
+import time
+import config
+import metrics
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_SYNCS = metrics.counter("reconcile_syncs_total", "Reconciler sync cycles", ("account",))
+RECONCILE_ERRORS = metrics.counter("reconcile_errors_total", "Reconciler sync cycles that failed", ("account",))
+RECONCILE_CHANGES = metrics.counter("reconcile_changes_total", "Changes published by the reconciler", ("kind",))
+
+POSITION = "position"
+ORDER = "order"
+BALANCE = "balance"
+
+_reconcilers = {}
+_reconcilers_lock = threading.Lock()
+
+
+class Change:
+    """One difference between two syncs; ``old`` is None for additions and ``new`` None for removals."""
+
+    __slots__ = ("kind", "key", "old", "new")
+
+    def __init__(self, kind, key, old, new):
+        self.kind = kind
+        self.key = key
+        self.old = old
+        self.new = new
+
+    @property
+    def action(self):
+        if self.old is None:
+            return "added"
+        if self.new is None:
+            return "removed"
+        return "changed"
+
+    def __repr__(self):
+        return "Change(%s %s %s)" % (self.kind, self.action, self.key)
+
+
+class AccountState:
+    """Positions, open orders and balance from one sync. Replaced, never mutated, once published."""
+
+    __slots__ = ("positions", "orders", "balance", "started", "updated")
+
+    def __init__(self, positions, orders, balance, started, updated):
+        self.positions = positions
+        self.orders = orders
+        self.balance = balance
+        self.started = started
+        self.updated = updated
+
+    @property
+    def active(self):
+        return bool(len(self.positions) or self.orders)
+
+    def orders_for(self, symbol):
+        return [order for order in self.orders.values() if _order_symbol_matches(order, symbol)]
+
+
+def _order_symbol_matches(order, symbol):
+    return order.get('symbol') == symbol or (order.get('info') or {}).get('product_symbol') == symbol
+
+
+def position_key(position):
+    """Identity of a position across syncs; Delta positions have no id, so this is usually the symbol."""
+    return position.id or position.symbol
+
+
+def _order_fingerprint(order):
+    return (order.get('status'), order.get('filled'), order.get('remaining'), order.get('price'), order.get('amount'))
+
+
+def _balance_fingerprint(balance):
+    entry = balance.get(config.RISK_BALANCE_CURRENCY) or {}
+    return entry.get('free'), entry.get('used'), entry.get('total')
+
+
+def diff_positions(old, new):
+    old_by_key = {position_key(p): p for p in old}
+    changes = []
+    for position in new:
+        key = position_key(position)
+        previous = old_by_key.pop(key, None)
+        if previous is None or (previous.size, previous.entry_price) != (position.size, position.entry_price):
+            changes.append(Change(POSITION, key, previous, position))
+    changes.extend(Change(POSITION, key, position, None) for key, position in old_by_key.items())
+    return changes
+
+
+def diff_orders(old, new):
+    changes = []
+    for order_id, order in new.items():
+        previous = old.get(order_id)
+        if previous is None or _order_fingerprint(previous) != _order_fingerprint(order):
+            changes.append(Change(ORDER, order_id, previous, order))
+    changes.extend(Change(ORDER, order_id, order, None) for order_id, order in old.items() if order_id not in new)
+    return changes
+
+
+class Reconciler:
+    """
+    Single source of positions, open orders and balance for one account.
+
+    One loop fetches positions and open orders (and the balance every
+    ``balance_interval`` seconds or after anything else changed), diffs them
+    against the previous sync and hands only the changes to subscribers.
+    Consumers read the cached ``state`` instead of polling the exchange, so
+    REST load does not grow with the number of consumers.
+
+    The schedule adapts: every ``active_interval`` seconds while positions
+    or orders are open, doubling up to ``idle_interval`` while flat.
+    ``poke`` resets it and wakes the loop without waiting for the sync, e.g.
+    after placing an order. Orders placed or cancelled by this process are
+    applied to the cached state straight away (``record_order`` and
+    ``forget_order``), so readers see them before that sync lands.
+    """
+
+    def __init__(self, client, account="MAIN", active_interval=None, idle_interval=None, balance_interval=None):
+        self.client = client
+        self.account = account
+        self.active_interval = config.RECONCILE_ACTIVE_INTERVAL if active_interval is None else active_interval
+        self.idle_interval = config.RECONCILE_IDLE_INTERVAL if idle_interval is None else idle_interval
+        self.balance_interval = config.RECONCILE_BALANCE_INTERVAL if balance_interval is None else balance_interval
+        self.interval = self.active_interval
+        self.state = None
+        self._balance_time = 0.0
+        self._subscribers = []
+        self._sync_lock = threading.RLock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def subscribe(self, callback, kinds=None):
+        """Call ``callback(changes)`` with each non-empty batch of changes of the given kinds."""
+        self._subscribers.append((callback, frozenset(kinds) if kinds else None))
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="reconcile-%s" % self.account, daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def poke(self):
+        self.interval = self.active_interval
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self.sync()
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    @staticmethod
+    def _stale(state, max_age):
+        if state is None:
+            return True
+        return max_age is not None and time.time() - state.updated > max_age
+
+    def snapshot(self, max_age=None):
+        """
+        Cached state, synced first if there is none or it is older than
+        ``max_age`` seconds. Returns None if that sync failed.
+        """
+        state = self.state
+        if self._stale(state, max_age):
+            with self._sync_lock:
+                # The loop may have synced while we waited for the lock
+                if self._stale(self.state, max_age):
+                    self.sync()
+                state = self.state
+            if self._stale(state, max_age):
+                return None
+        return state
+
+    def sync(self):
+        with self._sync_lock:
+            started = time.time()
+            previous = self.state
+            try:
+                positions = self.client.fetch_position_book()
+                orders = {order['id']: order for order in self.client.exchange.fetch_open_orders()}
+                balance = previous.balance if previous else None
+                changes = []
+                if previous is not None:
+                    changes = diff_positions(previous.positions, positions) + diff_orders(previous.orders, orders)
+                if balance is None or changes or started - self._balance_time >= self.balance_interval:
+                    balance = self.client.fetch_balance()
+                    self._balance_time = started
+                    if previous is not None and _balance_fingerprint(previous.balance) != _balance_fingerprint(balance):
+                        changes.append(Change(BALANCE, config.RISK_BALANCE_CURRENCY, previous.balance, balance))
+            except Exception as e:
+                RECONCILE_ERRORS.labels(self.account).inc()
+                logger.error("Reconcile for %s failed: %s", self.account, e)
+                return []
+
+            state = self.state = AccountState(positions, orders, balance, started, time.time())
+            RECONCILE_SYNCS.labels(self.account).inc()
+            if state.active or changes:
+                self.interval = self.active_interval
+            else:
+                self.interval = min(self.idle_interval, self.interval * 2)
+
+        if changes:
+            self._publish(changes)
+        return changes
+
+    def _publish(self, changes):
+        for change in changes:
+            RECONCILE_CHANGES.labels(change.kind).inc()
+        logger.debug("Reconcile %s: %s", self.account, changes)
+        for callback, kinds in list(self._subscribers):
+            batch = changes if kinds is None else [c for c in changes if c.kind in kinds]
+            if not batch:
+                continue
+            try:
+                callback(batch)
+            except Exception:
+                logger.exception("Reconcile subscriber failed")
+
+    def record_order(self, order):
+        """Add an open order we placed ourselves to the cached state without waiting for the next sync."""
+        if not order or order.get('id') is None or (order.get('status') or 'open').lower() != 'open':
+            return
+        with self._sync_lock:
+            state = self.state
+            if state is None:
+                return
+            orders = dict(state.orders)
+            orders[order['id']] = order
+            self.state = AccountState(state.positions, orders, state.balance, state.started, state.updated)
+
+    def forget_order(self, order_id):
+        """Drop an order we cancelled ourselves from the cached state without waiting for the next sync."""
+        with self._sync_lock:
+            state = self.state
+            if state is None or order_id not in state.orders:
+                return
+            orders = dict(state.orders)
+            orders.pop(order_id)
+            self.state = AccountState(state.positions, orders, state.balance, state.started, state.updated)
+
+
+def for_account(client, account="MAIN"):
+    """The process-wide ``Reconciler`` for ``account``, created on first use with ``client``."""
+    with _reconcilers_lock:
+        reconciler = _reconcilers.get(account)
+        if reconciler is None:
+            reconciler = _reconcilers[account] = Reconciler(client, account)
+        return reconciler
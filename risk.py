@@ -0,0 +1,279 @@
+import logging
+import math
+import threading
+import time
+import config
+import metrics
+import settings
+
+logger = logging.getLogger(__name__)
+
+RISK_REJECTIONS = metrics.counter("risk_rejections_total", "Orders rejected by the pre-trade risk check", ("reason",))
+RISK_RESIZES = metrics.counter("risk_resizes_total", "Orders shrunk by the pre-trade risk check", ("reason",))
+RISK_REFRESH_ERRORS = metrics.counter("risk_refresh_errors_total", "Failed balance/position refreshes")
+
+
+class RiskLimits:
+    """
+    Per-account limits. Sizes are in contracts, money in USD.
+
+    Defaults come from ``config.RISK_LIMITS``; an account can override any
+    of them with a ``RISK_LIMITS`` dict in its account settings.
+    """
+
+    __slots__ = ("max_order_size", "max_position_size", "max_notional", "leverage", "min_free_margin")
+
+    def __init__(self, max_order_size, max_position_size, max_notional, leverage, min_free_margin):
+        self.max_order_size = max_order_size
+        self.max_position_size = max_position_size
+        self.max_notional = max_notional
+        self.leverage = leverage
+        self.min_free_margin = min_free_margin
+
+    @classmethod
+    def for_account(cls, account):
+        limits = dict(config.RISK_LIMITS)
+        account_settings = settings.current().accounts.get(account)
+        if account_settings:
+            limits.update(account_settings.risk_limits)
+        return cls(**limits)
+
+
+class RiskDecision:
+    __slots__ = ("approved", "size", "reason")
+
+    def __init__(self, approved, size, reason=None):
+        self.approved = approved
+        self.size = size
+        self.reason = reason
+
+    def __bool__(self):
+        return self.approved
+
+    def __repr__(self):
+        return "RiskDecision(approved=%r, size=%r, reason=%r)" % (self.approved, self.size, self.reason)
+
+
+def _resting_entry(order):
+    """``(product symbol, side, unfilled size)`` of an order that can open exposure, else None."""
+    info = order.get('info') or {}
+    if order.get('reduceOnly') or str(info.get('reduce_only')).lower() == 'true':
+        return None
+    if order.get('triggerPrice') or order.get('stopPrice') or info.get('stop_order_type'):
+        return None
+    remaining = order.get('remaining')
+    if remaining is None:
+        remaining = (order.get('amount') or 0.0) - (order.get('filled') or 0.0)
+    side = (order.get('side') or '').lower()
+    if not remaining or side not in ("buy", "sell"):
+        return None
+    return info.get('product_symbol') or order.get('symbol'), side, float(remaining)
+
+
+class RiskManager:
+    """
+    Pre-trade checks against a locally cached balance and position state.
+
+    ``check`` never touches the network: it sizes an order against the
+    account's limits using the last refreshed free balance and positions
+    plus the exposure of orders approved since then and of resting entry
+    orders, and reserves what it approves. A background thread refreshes the cache every
+    ``refresh_interval`` seconds, or immediately after ``mark_dirty``
+    (called when orders are placed or positions closed). Orders are
+    rejected while the cache is older than ``max_staleness``.
+
+    With a ``reconciler`` the cache is read from its account state instead
+    of fetched, and refreshed whenever it reports a position, order or
+    balance change.
+    """
+
+    def __init__(self, client, account="MAIN", limits=None, refresh_interval=None, max_staleness=None,
+                 reconciler=None):
+        self.client = client
+        self.account = account
+        self.reconciler = reconciler
+        if reconciler is not None:
+            reconciler.subscribe(lambda changes: self.mark_dirty())
+        self.limits = limits or RiskLimits.for_account(account)
+        if limits is None:
+            settings.subscribe(self._on_settings)
+        self.refresh_interval = config.RISK_REFRESH_INTERVAL if refresh_interval is None else refresh_interval
+        self.max_staleness = config.RISK_MAX_STALENESS if max_staleness is None else max_staleness
+        self.available = 0.0
+        self.positions = {}
+        # symbol -> (buy, sell) contracts of resting orders that can open exposure
+        self.open_orders = {}
+        self.marks = {}
+        self.updated = None
+        # (time, symbol, signed size, margin) per approval since the last
+        # refresh, with running per-symbol and margin totals
+        self._reservations = []
+        self._pending = {}
+        self._reserved_margin = 0.0
+        self._lock = threading.Lock()
+        self._dirty = threading.Event()
+        self._thread = None
+
+    def _on_settings(self, new_settings):
+        if self.account in new_settings.accounts:
+            self.limits = RiskLimits.for_account(self.account)
+
+    def start(self):
+        if self._thread is None:
+            self.refresh()
+            self._thread = threading.Thread(target=self._run, name="risk-%s" % self.account, daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def _run(self):
+        while True:
+            self._dirty.wait(self.refresh_interval)
+            self._dirty.clear()
+            self.refresh()
+
+    def mark_dirty(self):
+        self._dirty.set()
+
+    def refresh(self):
+        """Reload balance and positions; reservations made before the fetch are dropped."""
+        if self.reconciler is not None:
+            state = self.reconciler.snapshot(self.refresh_interval)
+            if state is None:
+                RISK_REFRESH_ERRORS.inc()
+                return False
+            return self._apply(state.balance, state.positions, state.orders.values(), state.started)
+
+        started = time.time()
+        try:
+            balance = self.client.fetch_balance()
+            book = self.client.fetch_position_book()
+            orders = self.client.exchange.fetch_open_orders()
+        except Exception as e:
+            RISK_REFRESH_ERRORS.inc()
+            logger.error("Risk state refresh for %s failed: %s", self.account, e)
+            return False
+        return self._apply(balance, book, orders, started)
+
+    def _apply(self, balance, book, orders, started):
+        free = (balance.get(config.RISK_BALANCE_CURRENCY) or {}).get('free')
+        positions = {}
+        marks = {}
+        for position in book:
+            positions[position.symbol] = positions.get(position.symbol, 0.0) + position.size
+            if position.entry_price:
+                marks[position.symbol] = position.entry_price
+        open_orders = {}
+        for order in orders:
+            resting = _resting_entry(order)
+            if resting:
+                symbol, side, size = resting
+                buys, sells = open_orders.get(symbol, (0.0, 0.0))
+                open_orders[symbol] = (buys + size, sells) if side == "buy" else (buys, sells + size)
+        with self._lock:
+            self.available = float(free or 0.0)
+            self.positions = positions
+            self.open_orders = open_orders
+            self.marks.update(marks)
+            self._reservations = [r for r in self._reservations if r[0] > started]
+            self._pending = {}
+            for _, symbol, signed, _ in self._reservations:
+                self._pending[symbol] = self._pending.get(symbol, 0.0) + signed
+            self._reserved_margin = sum(r[3] for r in self._reservations)
+            self.updated = started
+        return True
+
+    def exposure(self, symbol):
+        """Cached position plus sizes approved since the last refresh (signed contracts)."""
+        return self.positions.get(symbol, 0.0) + self._pending.get(symbol, 0.0)
+
+    def _notional(self, symbol):
+        contract_value = config.CONTRACT_VALUES.get(symbol, config.DEFAULT_CONTRACT_VALUE)
+        return abs(self.exposure(symbol)) * contract_value * self.marks.get(symbol, 0.0)
+
+    def check(self, symbol, side, size, price):
+        """
+        Approve, shrink or reject an order of ``size`` contracts at ``price``.
+
+        An approved decision reserves its exposure and margin until the next
+        refresh; call ``release`` with the decision if the order then fails.
+        """
+        if self.updated is None or time.time() - self.updated > self.max_staleness:
+            return self._reject("stale", size)
+        if not price or price <= 0:
+            return self._reject("no_price", size)
+
+        limits = self.limits
+        direction = 1.0 if side == "buy" else -1.0
+        contract_value = config.CONTRACT_VALUES.get(symbol, config.DEFAULT_CONTRACT_VALUE)
+        contract_notional = contract_value * price
+        reason = None
+
+        with self._lock:
+            self.marks[symbol] = price
+            current = self.exposure(symbol)
+            allowed = size
+            if allowed > limits.max_order_size:
+                allowed, reason = limits.max_order_size, "order_size"
+
+            # Only the part of the order that grows the position is limited;
+            # resting orders on the same side may fill first, so they count too
+            reducing = min(allowed, max(0.0, -direction * current))
+            opening = allowed - reducing
+            if opening > 0:
+                buys, sells = self.open_orders.get(symbol, (0.0, 0.0))
+                held = abs(current + direction * reducing) + (buys if direction > 0 else sells)
+                room = limits.max_position_size - held
+                if opening > room:
+                    opening, reason = max(0.0, room), "position_size"
+
+                other = sum(self._notional(s) for s in set(self.positions) | set(self._pending) if s != symbol)
+                notional_room = (limits.max_notional - other) / contract_notional - held
+                if opening > notional_room:
+                    opening, reason = max(0.0, notional_room), "notional"
+
+                margin_room = (self.available - self._reserved_margin - limits.min_free_margin) \
+                    * limits.leverage / contract_notional
+                if opening > margin_room:
+                    opening, reason = max(0.0, margin_room), "margin"
+
+            allowed = math.floor(reducing + opening + 1e-9)
+            if allowed <= 0:
+                return self._reject(reason or "size", size)
+
+            opening = max(0.0, allowed - reducing)
+            self._reserve(symbol, direction * allowed, opening * contract_notional / limits.leverage)
+
+        if allowed < size:
+            RISK_RESIZES.labels(reason).inc()
+            logger.info("Risk resized %s %s %s -> %s (%s)", side, symbol, size, allowed, reason)
+        return RiskDecision(True, allowed, reason)
+
+    def record(self, symbol, side, size):
+        """Account for an order that bypassed ``check`` (e.g. a position close)."""
+        direction = 1.0 if side == "buy" else -1.0
+        with self._lock:
+            self._reserve(symbol, direction * size, 0.0)
+        self.mark_dirty()
+
+    def release(self, symbol, side, decision):
+        """Undo the reservation of an approved order that was not placed."""
+        signed = (1.0 if side == "buy" else -1.0) * decision.size
+        with self._lock:
+            reservations = self._reservations
+            for i in range(len(reservations) - 1, -1, -1):
+                _, reserved_symbol, reserved_size, margin = reservations[i]
+                if reserved_symbol == symbol and reserved_size == signed:
+                    del reservations[i]
+                    self._pending[symbol] -= signed
+                    self._reserved_margin -= margin
+                    break
+
+    def _reserve(self, symbol, signed, margin):
+        self._reservations.append((time.time(), symbol, signed, margin))
+        self._pending[symbol] = self._pending.get(symbol, 0.0) + signed
+        self._reserved_margin += margin
+
+    def _reject(self, reason, size):
+        RISK_REJECTIONS.labels(reason).inc()
+        logger.warning("Risk rejected order of %s for %s: %s", size, self.account, reason)
+        return RiskDecision(False, 0, reason)
@@ -0,0 +1,273 @@
+import copy
+import json
+import logging
+import os
+import signal
+import threading
+from bisect import bisect_right
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping, Optional, Tuple
+import config
+
+logger = logging.getLogger(__name__)
+
+TRAILING_UNITS = ("percent",)
+RISK_LIMIT_KEYS = frozenset(config.RISK_LIMITS)
+
+
+class ConfigError(ValueError):
+    pass
+
+
+@dataclass(frozen=True, slots=True)
+class TrailingLevel:
+    min_profit_pct: float
+    trailing_stop_offset: Optional[float]
+    book_fraction: float
+
+
+@dataclass(frozen=True, slots=True)
+class TrailingConfig:
+    start_trailing_profit_pct: float
+    fixed_stop_loss_pct: float
+    trailing_unit: str
+    levels: Tuple[TrailingLevel, ...]
+    thresholds: Tuple[float, ...]
+
+    def rule_for(self, profit_pct):
+        """Highest level whose ``min_profit_pct`` has been reached, or None before trailing starts."""
+        if profit_pct < self.start_trailing_profit_pct:
+            return None
+        i = bisect_right(self.thresholds, profit_pct)
+        return self.levels[i - 1] if i else None
+
+
+@dataclass(frozen=True, slots=True)
+class AccountConfig:
+    name: str
+    redis_key: str
+    api_key: str
+    api_secret: str
+    risk_limits: Mapping[str, float]
+
+
+@dataclass(frozen=True, slots=True)
+class Settings:
+    trailing: TrailingConfig
+    accounts: Mapping[str, AccountConfig]
+    version: int
+
+
+def _number(errors, where, value, minimum=None, maximum=None, optional=False):
+    if value is None and optional:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        errors.append("%s must be a number, got %r" % (where, value))
+        return None
+    value = float(value)
+    if minimum is not None and value < minimum:
+        errors.append("%s must be >= %s, got %s" % (where, minimum, value))
+    if maximum is not None and value > maximum:
+        errors.append("%s must be <= %s, got %s" % (where, maximum, value))
+    return value
+
+
+def _compile_trailing(raw, errors):
+    if not isinstance(raw, dict):
+        errors.append("profit_trailing must be a mapping")
+        return None
+    start = _number(errors, "profit_trailing.start_trailing_profit_pct", raw.get("start_trailing_profit_pct"), 0)
+    fixed = _number(errors, "profit_trailing.fixed_stop_loss_pct", raw.get("fixed_stop_loss_pct"), 0, 1)
+    unit = raw.get("trailing_unit", "percent")
+    if unit not in TRAILING_UNITS:
+        errors.append("profit_trailing.trailing_unit must be one of %s, got %r" % (TRAILING_UNITS, unit))
+
+    raw_levels = raw.get("levels") or ()
+    if not isinstance(raw_levels, (list, tuple)):
+        errors.append("profit_trailing.levels must be a list")
+        raw_levels = ()
+    levels = []
+    for i, level in enumerate(raw_levels):
+        where = "profit_trailing.levels[%d]" % i
+        if not isinstance(level, dict):
+            errors.append("%s must be a mapping" % where)
+            continue
+        unknown = set(level) - {"min_profit_pct", "trailing_stop_offset", "book_fraction"}
+        if unknown:
+            errors.append("%s has unknown keys %s" % (where, sorted(unknown)))
+        levels.append(TrailingLevel(
+            min_profit_pct=_number(errors, where + ".min_profit_pct", level.get("min_profit_pct"), 0),
+            trailing_stop_offset=_number(errors, where + ".trailing_stop_offset",
+                                         level.get("trailing_stop_offset"), 0, 1, optional=True),
+            book_fraction=_number(errors, where + ".book_fraction", level.get("book_fraction", 1.0), 0, 1),
+        ))
+    if not levels:
+        errors.append("profit_trailing.levels must not be empty")
+    if errors:
+        return None
+
+    levels.sort(key=lambda level: level.min_profit_pct)
+    thresholds = tuple(level.min_profit_pct for level in levels)
+    if len(set(thresholds)) != len(thresholds):
+        errors.append("profit_trailing.levels have duplicate min_profit_pct values")
+    return TrailingConfig(start, fixed, unit, tuple(levels), thresholds)
+
+
+def _compile_accounts(raw, errors):
+    if not isinstance(raw, dict) or not raw:
+        errors.append("accounts must be a non-empty mapping")
+        return None
+    accounts = {}
+    for name, account in raw.items():
+        where = "accounts.%s" % name
+        if not isinstance(account, dict):
+            errors.append("%s must be a mapping" % where)
+            continue
+        redis_key = account.get("REDIS_KEY")
+        if not redis_key or not isinstance(redis_key, str):
+            errors.append("%s.REDIS_KEY is required" % where)
+        limits = account.get("RISK_LIMITS") or {}
+        if not isinstance(limits, dict):
+            errors.append("%s.RISK_LIMITS must be a mapping" % where)
+            limits = {}
+        unknown = set(limits) - RISK_LIMIT_KEYS
+        if unknown:
+            errors.append("%s.RISK_LIMITS has unknown keys %s" % (where, sorted(unknown)))
+        for key, value in limits.items():
+            _number(errors, "%s.RISK_LIMITS.%s" % (where, key), value, 0)
+        accounts[name] = AccountConfig(
+            name=name,
+            redis_key=redis_key,
+            api_key=account.get("API_KEY", config.API_KEY),
+            api_secret=account.get("API_SECRET", config.API_SECRET),
+            risk_limits=MappingProxyType(dict(limits)),
+        )
+    return MappingProxyType(accounts)
+
+
+def compile_settings(trailing, accounts, version=0):
+    """Validate raw config dicts and build ``Settings``; raises ``ConfigError`` listing every problem."""
+    errors = []
+    compiled_trailing = _compile_trailing(trailing, errors)
+    compiled_accounts = _compile_accounts(accounts, errors)
+    if errors:
+        raise ConfigError("; ".join(errors))
+    return Settings(compiled_trailing, compiled_accounts, version)
+
+
+def load_sources(path=None):
+    """
+    Raw trailing and account config: ``config.py`` defaults, overridden by the
+    JSON file at ``path`` (``config.CONFIG_FILE``) if it exists.
+
+    The file may contain ``profit_trailing`` (merged key by key) and
+    ``accounts`` (replaces the account table).
+    """
+    trailing = copy.deepcopy(config.PROFIT_TRAILING_CONFIG)
+    accounts = copy.deepcopy(config.ACCOUNTS)
+    path = config.CONFIG_FILE if path is None else path
+    if path and os.path.exists(path):
+        with open(path) as f:
+            overrides = json.load(f)
+        if not isinstance(overrides, dict):
+            raise ConfigError("%s must contain a JSON object" % path)
+        trailing_overrides = overrides.get("profit_trailing") or {}
+        if not isinstance(trailing_overrides, dict):
+            raise ConfigError("%s: profit_trailing must be a JSON object" % path)
+        trailing.update(trailing_overrides)
+        if "accounts" in overrides:
+            accounts = overrides["accounts"]
+    return trailing, accounts
+
+
+_current = None
+_lock = threading.Lock()
+_listeners = []
+
+
+def current():
+    """The active ``Settings``; callers should read it once per unit of work."""
+    settings = _current
+    if settings is None:
+        with _lock:
+            if _current is None:
+                _swap(compile_settings(*load_sources(), version=1))
+            settings = _current
+    return settings
+
+
+def _swap(settings):
+    global _current
+    _current = settings
+
+
+def subscribe(callback):
+    """Call ``callback(settings)`` after every successful reload."""
+    _listeners.append(callback)
+
+
+def reload(path=None):
+    """Recompile and swap in new settings; on any error the running settings are kept."""
+    with _lock:
+        version = _current.version + 1 if _current else 1
+        try:
+            settings = compile_settings(*load_sources(path), version=version)
+        except Exception as e:
+            logger.error("Config reload rejected, keeping version %s: %s", version - 1, e)
+            return False
+        _swap(settings)
+    logger.info("Config version %d loaded: %d trailing levels, accounts %s",
+                settings.version, len(settings.trailing.levels), list(settings.accounts))
+    for callback in list(_listeners):
+        try:
+            callback(settings)
+        except Exception:
+            logger.exception("Config reload listener failed")
+    return True
+
+
+class ConfigWatcher:
+    """
+    Reloads settings when ``config.CONFIG_FILE`` changes or on SIGHUP.
+
+    The file is polled every ``interval`` seconds; the signal handler only
+    wakes the watcher thread, so the reload itself never runs inside a
+    signal handler.
+    """
+
+    def __init__(self, path=None, interval=None):
+        self.path = config.CONFIG_FILE if path is None else path
+        self.interval = config.CONFIG_WATCH_INTERVAL if interval is None else interval
+        self._wake = threading.Event()
+        self._stamp = self._file_stamp()
+        self._thread = None
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def start(self):
+        if hasattr(signal, "SIGHUP") and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGHUP, lambda signum, frame: self.trigger())
+        self._thread = threading.Thread(target=self._run, name="config-watcher", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def trigger(self):
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            forced = self._wake.wait(self.interval)
+            self._wake.clear()
+            stamp = self._file_stamp()
+            if forced or stamp != self._stamp:
+                self._stamp = stamp
+                try:
+                    reload(self.path)
+                except Exception:
+                    logger.exception("Config reload failed, keeping the running settings")
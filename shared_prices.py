@@ -0,0 +1,102 @@
+import logging
+import struct
+import time
+from multiprocessing import shared_memory
+import config
+
+logger = logging.getLogger(__name__)
+
+_WORD = struct.calcsize("Q")
+
+# A write holds a slot odd for well under a microsecond; a reader that still
+# sees it odd after this many yields assumes the writer died mid-write.
+_READ_ATTEMPTS = 100
+
+
+class SharedPriceTable:
+    """
+    Last prices in a ``multiprocessing.shared_memory`` block, one slot per symbol.
+
+    Layout is ``n`` uint64 sequence counters followed by ``n`` (price,
+    timestamp) float64 pairs, all 8-byte aligned. There is a single writer
+    (the feed process); it makes a slot's counter odd, writes the pair and
+    makes it even again. Readers in other processes index the block through
+    ``memoryview`` casts, with no copying or locking, and retry while the
+    counter is odd or changed under them (a seqlock). Retries yield the CPU
+    and are bounded, so a writer that dies mid-write cannot hang readers.
+
+    Every process must be given the same ``symbols`` list, which fixes the
+    slot order.
+    """
+
+    def __init__(self, symbols, name=None, create=False):
+        self.symbols = list(symbols)
+        self._slots = {symbol: i for i, symbol in enumerate(self.symbols)}
+        count = len(self.symbols)
+        self.owner = create
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=3 * _WORD * count)
+        self.name = self.shm.name
+        buf = self.shm.buf
+        self._seq = buf[:_WORD * count].cast("Q")
+        self._values = buf[_WORD * count:3 * _WORD * count].cast("d")
+        if create:
+            for i in range(count):
+                self._seq[i] = 0
+                self._values[2 * i] = float("nan")
+                self._values[2 * i + 1] = 0.0
+
+    @classmethod
+    def create(cls, symbols=None):
+        return cls(symbols or config.SHARED_PRICE_SYMBOLS, create=True)
+
+    @classmethod
+    def attach(cls, name, symbols=None):
+        return cls(symbols or config.SHARED_PRICE_SYMBOLS, name=name)
+
+    def write(self, symbol, price, timestamp=None):
+        i = self._slots.get(symbol)
+        if i is None:
+            return
+        seq = self._seq
+        start = seq[i]
+        seq[i] = start + 1
+        self._values[2 * i] = price
+        self._values[2 * i + 1] = time.time() if timestamp is None else timestamp
+        seq[i] = start + 2
+
+    def read(self, symbol):
+        """
+        ``(price, timestamp)`` for ``symbol``, or None if it was never
+        written, is unknown, or stayed mid-write through every retry.
+        """
+        i = self._slots.get(symbol)
+        if i is None:
+            return None
+        seq, values = self._seq, self._values
+        for _ in range(_READ_ATTEMPTS):
+            start = seq[i]
+            if not start & 1:
+                price = values[2 * i]
+                timestamp = values[2 * i + 1]
+                if seq[i] == start:
+                    if not start:
+                        return None
+                    return price, timestamp
+            time.sleep(0)
+        logger.warning("Shared price slot for %s stuck mid-write (sequence %d)", symbol, seq[i])
+        return None
+
+    def price(self, symbol, max_age=None):
+        entry = self.read(symbol)
+        if entry is None:
+            return None
+        if max_age is not None and time.time() - entry[1] > max_age:
+            return None
+        return entry[0]
+
+    def close(self):
+        self._seq.release()
+        self._values.release()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
@@ -0,0 +1,90 @@
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SignalDeduplicator:
+    """
+    Drops redeliveries of the latest signal.
+
+    Signals are compared by content key. A key equal to the last accepted one
+    within ``window`` seconds is a duplicate; the same content after the
+    window, or after a different signal in between (a buy/short/buy flip),
+    is accepted as new.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self._last_key = None
+        self._last_time = 0.0
+        self._lock = threading.Lock()
+
+    def is_duplicate(self, key, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if key == self._last_key and now - self._last_time < self.window:
+                return True
+            self._last_key = key
+            self._last_time = now
+            return False
+
+    def clear(self):
+        with self._lock:
+            self._last_key = None
+
+
+class SignalDebouncer:
+    """
+    Collapses bursts of signals to the latest one.
+
+    Each submission restarts a ``delay`` quiet period; when it elapses (or
+    ``max_delay`` after the first signal of the burst) only the most recent
+    signal is handed to ``callback``. Callbacks run one at a time on a single
+    worker thread. With ``delay <= 0`` signals are passed straight through.
+    """
+
+    def __init__(self, callback, delay, max_delay, on_collapse=None):
+        self.callback = callback
+        self.delay = delay
+        self.max_delay = max_delay
+        self.on_collapse = on_collapse
+        self._cond = threading.Condition()
+        self._pending = None
+        self._first = 0.0
+        self._deadline = 0.0
+        self._worker = None
+
+    def submit(self, item):
+        if self.delay <= 0:
+            self.callback(item)
+            return
+
+        with self._cond:
+            now = time.monotonic()
+            if self._pending is None:
+                self._first = now
+            elif self.on_collapse:
+                self.on_collapse(self._pending)
+            self._pending = item
+            self._deadline = min(now + self.delay, self._first + self.max_delay)
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="signal-debounce", daemon=True)
+                self._worker.start()
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None:
+                    self._cond.wait()
+                remaining = self._deadline - time.monotonic()
+                while remaining > 0:
+                    self._cond.wait(remaining)
+                    remaining = self._deadline - time.monotonic()
+                item, self._pending = self._pending, None
+            try:
+                self.callback(item)
+            except Exception:
+                logger.exception("Debounced signal handler failed")
@@ -1,17 +1,30 @@
 import time
 import logging
 import json
+from functools import partial
 from order_manager import OrderManager
 from trade_manager import TradeManager
 from firebase_client import stream_signal
 import config
+import metrics
+import orderbook
+from quantize import ROUND_DOWN, ROUND_UP
+from risk import RiskManager
+import reconciler
+from execution import client_order_id, plan_closes, run_batch, signal_key
+from signal_filter import SignalDebouncer, SignalDeduplicator
 
 logger = logging.getLogger(__name__)
 
+SIGNALS_PROCESSED = metrics.counter("signals_processed_total", "Signals accepted for processing", ("type",))
+SIGNALS_DROPPED = metrics.counter("signals_dropped_total", "Signals dropped before processing", ("reason",))
+
 class OrderHandler:
-    def __init__(self, order_manager, trade_manager):
+    def __init__(self, order_manager, trade_manager, risk=None, reconciler=None):
         self.order_manager = order_manager
         self.trade_manager = trade_manager
+        self.risk = risk
+        self.reconciler = reconciler
 
     @staticmethod
     def adjust_price(price, offset):
@@ -20,9 +33,27 @@ class OrderHandler:
         except Exception:
             return price
 
+    def _open_orders(self, symbol):
+        if self.reconciler:
+            state = self.reconciler.snapshot(config.RECONCILE_MAX_AGE)
+            if state is not None:
+                return state.orders_for(symbol)
+        return self.order_manager.client.exchange.fetch_open_orders(symbol)
+
+    def _position_book(self):
+        if self.reconciler:
+            state = self.reconciler.snapshot(config.RECONCILE_MAX_AGE)
+            if state is not None:
+                return state.positions
+        return self.order_manager.client.fetch_position_book()
+
+    def _state_changed(self):
+        if self.reconciler:
+            self.reconciler.poke()
+
     def cancel_conflicting_orders(self, symbol, new_side):
         try:
-            orders = self.order_manager.client.exchange.fetch_open_orders(symbol)
+            orders = self._open_orders(symbol)
             for order in orders:
                 if order.get('status', '').lower() != 'open':
                     continue
@@ -30,48 +61,72 @@ class OrderHandler:
                 if new_side == "" or order_side != new_side.lower():
                     self._cancel_order(order['id'], symbol)
         except Exception as e:
-            logger.error(f"Error canceling conflicting orders: {e}")
+            logger.error("Error canceling conflicting orders: %s", e)
 
     def cancel_same_side_orders(self, symbol, side):
         try:
-            orders = self.order_manager.client.exchange.fetch_open_orders(symbol)
+            orders = self._open_orders(symbol)
             for order in orders:
                 if order.get('side', '').lower() == side.lower():
                     self._cancel_order(order['id'], symbol)
         except Exception as e:
-            logger.error(f"Error canceling same-side orders: {e}")
+            logger.error("Error canceling same-side orders: %s", e)
 
     def _cancel_order(self, order_id, symbol):
         try:
             self.order_manager.client.cancel_order(order_id, symbol)
-            logger.info(f"Canceled order: {order_id}")
+            logger.info("Canceled order: %s", order_id)
+            if self.reconciler:
+                self.reconciler.forget_order(order_id)
         except Exception as e:
-            logger.error(f"Error canceling order {order_id}: {e}")
+            logger.error("Error canceling order %s: %s", order_id, e)
 
     def pending_order_exists(self, symbol, side):
         try:
-            orders = self.order_manager.client.exchange.fetch_open_orders(symbol)
+            orders = self._open_orders(symbol)
             return any(order.get('side', '').lower() == side.lower() 
                       and order.get('status', '').lower() == 'open' for order in orders)
         except Exception as e:
-            logger.error(f"Error checking pending orders: {e}")
+            logger.error("Error checking pending orders: %s", e)
             return False
 
-    def place_limit_order(self, symbol, side, entry_price):
+    def place_limit_order(self, symbol, side, entry_price, client_order_id=None):
+        size = config.ORDER_SIZE
+        decision = None
+        if self.risk:
+            decision = self.risk.check(symbol, side, size, entry_price)
+            if not decision:
+                return None
+            size = decision.size
+
+        order = None
         try:
-            return self.order_manager.place_order(
-                symbol, side, 1, entry_price, params={"time_in_force": "gtc"}
+            order = self.order_manager.place_order(
+                symbol, side, size, entry_price, params={"time_in_force": "gtc"},
+                client_order_id=client_order_id
             )
         except Exception as e:
-            logger.error(f"Limit order failed: {e}")
-            return None
+            logger.error("Limit order failed: %s", e)
+        if decision:
+            if order is None:
+                self.risk.release(symbol, side, decision)
+            else:
+                self.risk.mark_dirty()
+        if order is not None:
+            if self.reconciler:
+                self.reconciler.record_order(order)
+            self._state_changed()
+        return order
 
     def attach_bracket(self, order_id, symbol, sl_price, tp_price):
+        client = self.order_manager.client
+        sl_price = client.price_to_precision(symbol, sl_price)
+        tp_price = client.price_to_precision(symbol, tp_price)
         bracket_params = {
-            "bracket_stop_loss_limit_price": str(sl_price),
-            "bracket_stop_loss_price": str(sl_price),
-            "bracket_take_profit_limit_price": str(tp_price),
-            "bracket_take_profit_price": str(tp_price),
+            "bracket_stop_loss_limit_price": sl_price,
+            "bracket_stop_loss_price": sl_price,
+            "bracket_take_profit_limit_price": tp_price,
+            "bracket_take_profit_price": tp_price,
             "bracket_stop_trigger_method": "last_traded_price"
         }
         try:
@@ -79,99 +134,119 @@ class OrderHandler:
                 order_id, 27, symbol, bracket_params
             )
         except Exception as e:
-            logger.error(f"Bracket attachment failed: {e}")
+            logger.error("Bracket attachment failed: %s", e)
             return None
 
-    def close_positions(self, symbol):
+    def close_positions(self, symbol, signal_id=None):
+        """
+        Flatten every position matching ``symbol`` with one netted order per
+        product, sent concurrently. Returns the per-order results and the
+        wall time.
+        """
         try:
-            positions = self.order_manager.client.fetch_positions()
-            for pos in positions:
-                self._close_position(pos, symbol)
+            positions = self._position_book().matching(symbol)
         except Exception as e:
-            logger.error(f"Position closing error: {e}")
-
-    def _close_position(self, pos, symbol):
-        pos_symbol = pos.get('info', {}).get('product_symbol') or pos.get('symbol')
-        if not pos_symbol or symbol not in pos_symbol:
-            return
-
-        pos_size = pos.get('size') or pos.get('contracts') or "0"
-        try:
-            pos_amount = float(pos_size)
-        except ValueError:
-            return
-
-        if pos_amount == 0:
-            return
-
-        side = "buy" if pos_amount < 0 else "sell"
-        qty = abs(pos_amount)
-        logger.info(f"Closing {side} position of size {qty}")
-        self.trade_manager.place_market_order(
-            symbol, side, qty, params={"time_in_force": "ioc"}
+            logger.error("Position closing error: %s", e)
+            return [], 0.0
+        actions = plan_closes(positions, signal_id) if signal_id else plan_closes(positions)
+        if not actions:
+            return [], 0.0
+        results, elapsed = run_batch("close", [partial(self._close, action) for action in actions])
+        for action, result in zip(actions, results):
+            if isinstance(result, Exception):
+                logger.error("Position closing error for %s: %s", action.symbol, result)
+        if any(result and not isinstance(result, Exception) for result in results):
+            self._state_changed()
+        return results, elapsed
+
+    def _close(self, action):
+        logger.info("Closing %d %s position(s) with %s %s", len(action.positions), action.symbol, action.side, action.size)
+        order = self.trade_manager.place_market_order(
+            action.symbol, action.side, action.size, params={"time_in_force": "ioc"},
+            client_order_id=action.client_order_id
         )
+        if order and self.risk:
+            self.risk.record(action.symbol, action.side, action.size)
+        return order
 
     def has_open_position(self, symbol, side):
         try:
-            positions = self.order_manager.client.fetch_positions()
-            for pos in positions:
-                symbol_match = (pos.get('info', {}).get('product_symbol') or pos.get('symbol')) == symbol
-                size = float(pos.get('size') or pos.get('contracts') or 0)
-                if not symbol_match or size == 0:
-                    continue
-                return (side == "buy" and size > 0) or (side == "sell" and size < 0)
+            for position in self._position_book().for_symbol(symbol):
+                return (side == "buy" and position.size > 0) or (side == "sell" and position.size < 0)
         except Exception as e:
             logger.error("Error checking open position: %s", e)
         return False
 
 
 class SignalProcessor:
-    def __init__(self, symbol="BTCUSD"):
+    def __init__(self, symbol="BTCUSD", account="MAIN"):
         self.symbol = symbol
+        self.account = account
         self.last_signal = None
-        self.order_handler = OrderHandler(OrderManager(), TradeManager())
+        self.settle_delay = config.ORDER_SETTLE_DELAY
+        self.deduplicator = SignalDeduplicator(config.SIGNAL_DEDUP_WINDOW)
+        self.debouncer = SignalDebouncer(
+            self._dispatch, config.SIGNAL_DEBOUNCE_DELAY, config.SIGNAL_DEBOUNCE_MAX_DELAY,
+            on_collapse=self._on_debounced
+        )
+        order_manager = OrderManager(account)
+        self.reconciler = reconciler.for_account(order_manager.client, account)
+        self.risk = RiskManager(order_manager.client, account, reconciler=self.reconciler) if config.RISK_CHECKS else None
+        self.order_handler = OrderHandler(order_manager, TradeManager(account), self.risk, self.reconciler)
 
     def process(self, signal_data):
         if not self._validate_signal(signal_data):
             return
+        self.debouncer.submit(signal_data)
 
+    def _dispatch(self, signal_data):
         signal_type = self._get_signal_type(signal_data)
+        SIGNALS_PROCESSED.labels(signal_type or "invalid").inc()
         if signal_type == "tp":
-            self._process_tp_signal()
+            self._process_tp_signal(signal_data)
             return
 
         if signal_type not in ("buy", "sell"):
-            logger.warning(f"Invalid signal: {signal_data.get('text', '')}")
+            logger.warning("Invalid signal: %s", signal_data.get('text', ''))
             return
 
         self._process_trade_signal(signal_data, signal_type)
 
-    def _process_tp_signal(self):
+    def _process_tp_signal(self, signal_data):
         logger.info("Processing take profit signal")
-        self.order_handler.close_positions(self.symbol)
+        self.order_handler.close_positions(self.symbol, signal_key(signal_data))
 
     def _process_trade_signal(self, signal_data, side):
         opposite_side = "sell" if side == "buy" else "buy"
-        self.order_handler.close_positions(self.symbol)  # always close before new
+        signal_id = signal_key(signal_data)
+        self.order_handler.close_positions(self.symbol, signal_id)  # always close before new
 
         self._cancel_existing_orders(side)
-        time.sleep(2)
+        if self.settle_delay:
+            time.sleep(self.settle_delay)
 
         if self.order_handler.pending_order_exists(self.symbol, side):
-            logger.info(f"Existing {side} order present")
+            logger.info("Existing %s order present", side)
             return
 
         prices = self._calculate_prices(signal_data, side)
-        self._place_order_with_bracket(side, prices)
+        self._place_order_with_bracket(side, prices, client_order_id(signal_id, "entry", side))
+
+    def _fallback_price(self):
+        # The streamed feed of this process (the shared price table in
+        # account workers), then the ticker cache and REST
+        try:
+            return self.order_handler.trade_manager.get_current_price(self.symbol)
+        except Exception:
+            return None
 
     def _calculate_prices(self, signal_data, side):
         raw_price = signal_data["last_signal"].get("price")
         try:
             raw_price = float(raw_price)
         except (ValueError, TypeError):
-            logger.warning("Invalid or missing price. Using fallback from Binance.")
-            from binance_ws import current_price as fallback_price
-            raw_price = fallback_price
+            logger.warning("Invalid or missing price. Using fallback from the price feed.")
+            raw_price = self._fallback_price()
 
         offset = config.FIXED_OFFSET
 
@@ -202,11 +277,39 @@ class SignalProcessor:
         except Exception:
             logger.warning("Zone fallback in effect due to invalid zone data.")
 
+        book_entry = self._book_entry_price(side, raw_price)
+        if book_entry is not None:
+            logger.info("Entry from %s book: %s (signal-based %s)", config.ORDERBOOK_VENUE, book_entry, entry)
+            entry = book_entry
+
         return entry, sl, tp
 
-    def _place_order_with_bracket(self, side, prices):
+    def _book_entry_price(self, side, reference):
+        """
+        Passive entry at the book's microprice, one tick inside the far side.
+
+        Returns None when order-book entries are disabled, the book is stale
+        or empty, or its mid is too far from ``reference`` to trust.
+        """
+        if not config.ORDERBOOK_ENTRY:
+            return None
+        book = orderbook.get_book(config.ORDERBOOK_VENUE, self.symbol)
+        quote = book.fresh_quote() if book else None
+        if quote is None:
+            return None
+        if reference and abs(quote.mid - reference) > config.ORDERBOOK_MAX_DEVIATION:
+            logger.warning("Book mid %s too far from signal price %s, ignoring book", quote.mid, reference)
+            return None
+
+        quantizer = self.order_handler.order_manager.client.quantizer.get(self.symbol)
+        tick = quantizer.tick.size
+        if side == "buy":
+            return quantizer.price(min(quote.microprice, quote.ask - tick), ROUND_DOWN)
+        return quantizer.price(max(quote.microprice, quote.bid + tick), ROUND_UP)
+
+    def _place_order_with_bracket(self, side, prices, client_order_id=None):
         entry_price, sl_price, tp_price = prices
-        order = self.order_handler.place_limit_order(self.symbol, side, entry_price)
+        order = self.order_handler.place_limit_order(self.symbol, side, entry_price, client_order_id)
         if order:
             self.order_handler.attach_bracket(order['id'], self.symbol, sl_price, tp_price)
 
@@ -224,25 +327,50 @@ class SignalProcessor:
         if not signal_data:
             return False
 
+        if "last_signal" not in signal_data or "text" not in signal_data["last_signal"]:
+            SIGNALS_DROPPED.labels("malformed").inc()
+            return False
+
         if not self._is_new_signal(signal_data):
+            SIGNALS_DROPPED.labels("duplicate").inc()
             logger.debug("Duplicate signal")
             return False
 
         self.last_signal = signal_data
-        return "last_signal" in signal_data and "text" in signal_data["last_signal"]
+        return True
 
     def _is_new_signal(self, signal_data):
-        return self.last_signal is None or \
-            signal_data["last_signal"].get("text") != self.last_signal["last_signal"].get("text")
+        return not self.deduplicator.is_duplicate(signal_key(signal_data))
+
+    def _on_debounced(self, signal_data):
+        SIGNALS_DROPPED.labels("debounced").inc()
+        logger.info("Superseded signal dropped: %s", signal_data["last_signal"].get("text"))
 
 
 class TradingBot:
-    def __init__(self):
-        self.signal_processor = SignalProcessor()
+    def __init__(self, account="MAIN"):
+        self.account = account
+        self.signal_processor = SignalProcessor(account=account)
 
     def start(self):
-        logger.info("Starting signal listener")
-        stream_signal("MAIN", self._firebase_callback)
+        self._warm_order_path()
+        self.signal_processor.reconciler.start()
+        if self.signal_processor.risk:
+            self.signal_processor.risk.start()
+        if config.ORDERBOOK_ENTRY:
+            orderbook.start_stream(config.ORDERBOOK_VENUE, self.signal_processor.symbol)
+        logger.info("Starting signal listener for %s", self.account)
+        return stream_signal(self.account, self._firebase_callback)
+
+    def _warm_order_path(self):
+        symbol = self.signal_processor.symbol
+        handler = self.signal_processor.order_handler
+        for client in (handler.order_manager.client, handler.trade_manager.client):
+            if client.fast_orders:
+                try:
+                    client.fast_orders.warm([symbol])
+                except Exception as e:
+                    logger.warning("Could not pre-build order templates for %s: %s", symbol, e)
 
     def _firebase_callback(self, message):
         print("\n[FIREBASE] Update Event:")
@@ -4,65 +4,50 @@ import uuid
 from exchange import DeltaExchangeClient
 from order_manager import OrderManager
 from firebase_client import store_order
+from price_service import PriceService
+from trailing_scheduler import TrailingScheduler
 import config
 
 logger = logging.getLogger(__name__)
 
 class TradeManager:
-    def __init__(self):
-        self.client = DeltaExchangeClient()
-        self.order_manager = OrderManager()
-        self.highest_price = None
+    def __init__(self, account="MAIN"):
+        self.account = account
+        self.client = DeltaExchangeClient(account)
+        self.order_manager = OrderManager(account)
+        self.price_service = PriceService(self.client)
+        self.trailing_scheduler = TrailingScheduler(
+            self.order_manager, self.get_current_price, self.client.price_to_precision
+        )
 
     def get_current_price(self, product_symbol):
         try:
-            ticker = self.client.exchange.fetch_ticker(product_symbol)
-            price = ticker.get('last')
-            return float(price)
+            return self.price_service.get_price(product_symbol)
         except Exception as e:
             logger.error("Error fetching current price for %s: %s", product_symbol, e)
             raise
 
     def monitor_trailing_stop(self, bracket_order_id, product_symbol, trailing_stop_percent, update_interval=10):
-        logger.info("Starting trailing stop monitoring for %s", product_symbol)
-        self.highest_price = self.get_current_price(product_symbol)
-        logger.info("Initial highest price: %s", self.highest_price)
-
-        while True:
-            try:
-                current_price = self.get_current_price(product_symbol)
-            except Exception as e:
-                logger.error("Error fetching price, retrying: %s", e)
-                time.sleep(update_interval)
-                continue
-
-            if current_price > self.highest_price:
-                self.highest_price = current_price
-                logger.info("New highest price: %s", self.highest_price)
-
-            new_stop_loss = self.highest_price * (1 - trailing_stop_percent / 100.0)
-            logger.info("Current price: %.2f, Calculated new stop loss: %.2f", current_price, new_stop_loss)
+        """
+        Register a bracket order with the shared trailing scheduler.
 
-            new_stop_loss_order = {
-                "order_type": "limit_order",
-                "stop_price": str(round(new_stop_loss, 2)),
-                "limit_price": str(round(new_stop_loss * 0.99, 2))
-            }
-
-            try:
-                modified_order = self.order_manager.modify_bracket_order(bracket_order_id, new_stop_loss_order=new_stop_loss_order)
-                logger.info("Modified bracket order: %s", modified_order)
-            except Exception as e:
-                logger.error("Error modifying bracket order: %s", e)
+        Returns immediately; all trailed orders are driven from one scheduler
+        thread, each with its own high-water mark.
+        """
+        logger.info("Starting trailing stop monitoring for %s", product_symbol)
+        self.trailing_scheduler.add(bracket_order_id, product_symbol, trailing_stop_percent, update_interval)
+        self.trailing_scheduler.start()
 
-            time.sleep(update_interval)
+    def stop_trailing(self, bracket_order_id):
+        return self.trailing_scheduler.remove(bracket_order_id)
 
-    def place_market_order(self, symbol, side, amount, params=None):
+    def place_market_order(self, symbol, side, amount, params=None, client_order_id=None):
         try:
-            order = self.client.exchange.create_order(symbol, 'market', side, amount, None, params or {})
-            order_id = order.get('id', str(uuid.uuid4()))
+            order = self.client.create_market_order(symbol, side, amount, params, client_order_id)
+            order_id = order.get('id') or str(uuid.uuid4())
             order_info = {
                 'id': order_id,
+                'client_order_id': order.get('clientOrderId', client_order_id),
                 'symbol': symbol,
                 'side': side,
                 'amount': amount,
@@ -71,7 +56,7 @@ class TradeManager:
                 'timestamp': order.get('timestamp', int(time.time() * 1000))
             }
             self.order_manager.orders[order_id] = order_info
-            store_order("MAIN", order_id, order_info)
+            store_order(self.account, order_id, order_info)
             logger.info("Market order placed: %s", order_info)
             return order_info
         except Exception as e:
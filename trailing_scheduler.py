@@ -0,0 +1,162 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class TrailingStop:
+    __slots__ = (
+        "bracket_order_id", "product_symbol", "trailing_stop_percent",
+        "update_interval", "highest_price", "last_stop_price",
+    )
+
+    def __init__(self, bracket_order_id, product_symbol, trailing_stop_percent, update_interval):
+        self.bracket_order_id = bracket_order_id
+        self.product_symbol = product_symbol
+        self.trailing_stop_percent = trailing_stop_percent
+        self.update_interval = update_interval
+        self.highest_price = None
+        self.last_stop_price = None
+
+
+class TrailingScheduler:
+    """
+    Trails many bracket orders from a single thread.
+
+    Every registered order gets its own high-water mark and its own due time
+    on a timer heap. Orders that fall due together share one price read per
+    symbol, so the thread count stays constant no matter how many brackets
+    are being trailed.
+    """
+
+    def __init__(self, order_manager, price_source, price_formatter):
+        self.order_manager = order_manager
+        self.price_source = price_source
+        self.price_formatter = price_formatter
+        self._stops = {}
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    def add(self, bracket_order_id, product_symbol, trailing_stop_percent, update_interval=10):
+        stop = TrailingStop(bracket_order_id, product_symbol, trailing_stop_percent, update_interval)
+        with self._cond:
+            self._stops[bracket_order_id] = stop
+            heapq.heappush(self._heap, (time.monotonic(), next(self._seq), stop))
+            self._cond.notify()
+        logger.info("Trailing stop registered for %s (%s)", bracket_order_id, product_symbol)
+        return stop
+
+    def remove(self, bracket_order_id):
+        with self._cond:
+            stop = self._stops.pop(bracket_order_id, None)
+        if stop:
+            logger.info("Trailing stop removed for %s", bracket_order_id)
+        return stop
+
+    def __len__(self):
+        return len(self._stops)
+
+    def start(self):
+        with self._cond:
+            old = self._thread
+            if old and old.is_alive() and self._running:
+                return old
+        if old and old.is_alive() and old is not threading.current_thread():
+            # A stopped thread may still be finishing its last batch.
+            old.join()
+        with self._cond:
+            if self._thread is not old and self._thread.is_alive():
+                return self._thread
+            self._running = True
+            thread = self._thread = threading.Thread(target=self.run, name="trailing-scheduler", daemon=True)
+            thread.start()
+        return thread
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+
+    def run(self):
+        while True:
+            due = self._wait_for_due()
+            if due is None:
+                return
+            self._process(due)
+
+    def _wait_for_due(self):
+        with self._cond:
+            # A replaced thread bows out even if the scheduler was restarted.
+            while self._running and self._thread is threading.current_thread():
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                delay = self._heap[0][0] - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                return self._pop_due()
+        return None
+
+    def _pop_due(self):
+        now = time.monotonic()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, _, stop = heapq.heappop(self._heap)
+            # Entries of removed or re-registered orders are dropped lazily.
+            if self._stops.get(stop.bracket_order_id) is stop:
+                due.append(stop)
+        return due
+
+    def _process(self, due):
+        prices = {}
+        for stop in due:
+            symbol = stop.product_symbol
+            if symbol not in prices:
+                try:
+                    prices[symbol] = self.price_source(symbol)
+                except Exception as e:
+                    logger.error("Error fetching price for %s: %s", symbol, e)
+                    prices[symbol] = None
+            price = prices[symbol]
+            if price:
+                self._evaluate(stop, float(price))
+
+        now = time.monotonic()
+        with self._cond:
+            for stop in due:
+                if self._stops.get(stop.bracket_order_id) is stop:
+                    heapq.heappush(self._heap, (now + stop.update_interval, next(self._seq), stop))
+
+    def _evaluate(self, stop, current_price):
+        if stop.highest_price is None or current_price > stop.highest_price:
+            stop.highest_price = current_price
+            logger.debug("New highest price for %s: %s", stop.bracket_order_id, current_price)
+
+        symbol = stop.product_symbol
+        stop_price = self.price_formatter(symbol, stop.highest_price * (1 - stop.trailing_stop_percent / 100.0))
+        new_stop_loss = float(stop_price)
+        if stop.last_stop_price is not None and new_stop_loss <= stop.last_stop_price:
+            return
+
+        new_stop_loss_order = {
+            "order_type": "limit_order",
+            "stop_price": stop_price,
+            "limit_price": self.price_formatter(symbol, new_stop_loss * 0.99)
+        }
+        try:
+            modified_order = self.order_manager.modify_bracket_order(
+                stop.bracket_order_id, new_stop_loss_order=new_stop_loss_order
+            )
+            stop.last_stop_price = new_stop_loss
+            logger.info("Modified bracket order %s: stop %.2f (price %.2f)",
+                        stop.bracket_order_id, new_stop_loss, current_price)
+            return modified_order
+        except Exception as e:
+            logger.error("Error modifying bracket order %s: %s", stop.bracket_order_id, e)
@@ -1,14 +1,107 @@
 import datetime
+import math
+import time
+import numpy as np
 
-def timestamp_to_str(timestamp, fmt="%Y-%m-%d %H:%M:%S"):
-    if timestamp > 1e12:
-        dt = datetime.datetime.fromtimestamp(timestamp / 1e6)
-    elif timestamp > 1e9:
-        dt = datetime.datetime.fromtimestamp(timestamp / 1e3)
-    else:
-        dt = datetime.datetime.fromtimestamp(timestamp)
+DEFAULT_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Nanoseconds per unit of an epoch timestamp
+UNIT_NS = {"s": 1_000_000_000, "ms": 1_000_000, "us": 1_000, "ns": 1}
+
+
+def guess_unit(timestamp):
+    """
+    Infer the unit of an epoch timestamp from its magnitude.
+
+    Thresholds sit between present-day values of each unit (~1.7e9 s,
+    ~1.7e12 ms, ~1.7e15 us, ~1.7e18 ns). Pass ``unit`` explicitly wherever
+    the source is known.
+    """
+    magnitude = abs(timestamp)
+    if magnitude > 1e17:
+        return "ns"
+    if magnitude > 1e14:
+        return "us"
+    if magnitude > 1e11:
+        return "ms"
+    return "s"
+
+
+def to_seconds(timestamp, unit=None):
+    return timestamp * UNIT_NS[unit or guess_unit(timestamp)] / 1e9
+
+
+class SecondFormatter:
+    """
+    Formats epoch timestamps as local ``%Y-%m-%d %H:%M:%S`` strings.
+
+    The ``YYYY-mm-dd HH:MM:`` prefix is cached per minute and the full string
+    per second, so calls within the same second return the cached string.
+    Each cache is a ``(key, text)`` tuple swapped in with one assignment, so
+    concurrent callers never see one second's key with another's text.
+    """
+
+    __slots__ = ("_minute", "_second")
+
+    def __init__(self):
+        self._minute = (None, "")
+        self._second = (None, "")
+
+    def format(self, timestamp, unit=None):
+        second = math.floor(to_seconds(timestamp, unit))
+        cached_second, text = self._second
+        if second == cached_second:
+            return text
+        minute = second // 60
+        cached_minute, prefix = self._minute
+        if minute != cached_minute:
+            prefix = time.strftime("%Y-%m-%d %H:%M:", time.localtime(minute * 60))
+            self._minute = (minute, prefix)
+        text = "%s%02d" % (prefix, second - minute * 60)
+        self._second = (second, text)
+        return text
+
+
+_formatter = SecondFormatter()
+
+
+def timestamp_to_str(timestamp, fmt=DEFAULT_TIME_FORMAT, unit=None):
+    if fmt == DEFAULT_TIME_FORMAT:
+        return _formatter.format(timestamp, unit)
+    dt = datetime.datetime.fromtimestamp(to_seconds(timestamp, unit))
     return dt.strftime(fmt)
 
+
+def _unit_scale(values):
+    magnitude = np.abs(values)
+    return np.select(
+        [magnitude > 1e17, magnitude > 1e14, magnitude > 1e11],
+        [UNIT_NS["ns"], UNIT_NS["us"], UNIT_NS["ms"]],
+        default=UNIT_NS["s"],
+    ).astype(np.int64)
+
+
+def to_epoch_ns(timestamps, unit=None):
+    """
+    Convert an array of epoch timestamps to int64 nanoseconds.
+
+    With ``unit=None`` each element's unit is inferred from its magnitude,
+    so arrays mixing s/ms/us/ns are handled in one pass. Float inputs are
+    split into whole and fractional parts to keep sub-unit precision.
+    """
+    values = np.asarray(timestamps)
+    scale = np.int64(UNIT_NS[unit]) if unit else _unit_scale(values)
+    if values.dtype.kind in "iu":
+        return values.astype(np.int64) * scale
+    whole = np.floor(values)
+    frac = values - whole
+    return whole.astype(np.int64) * scale + np.rint(frac * scale).astype(np.int64)
+
+
+def to_datetime64(timestamps, unit=None):
+    return to_epoch_ns(timestamps, unit).view("datetime64[ns]")
+
+
 def round_decimal(value, precision=2):
     try:
         return round(float(value), precision)
@@ -22,3 +115,25 @@ if __name__ == "__main__":
     print("Milliseconds timestamp:", test_timestamp_milli, "->", timestamp_to_str(test_timestamp_milli))
     test_value = "123.456789"
     print("Rounded value:", round_decimal(test_value, 2))
+
+    n = 1_000_000
+    base = 1742402453
+    seconds = base + np.arange(n) // 1000
+    mixed = np.concatenate([seconds[: n // 4], seconds[n // 4: n // 2] * 1000,
+                            seconds[n // 2: 3 * n // 4] * 1_000_000, seconds[3 * n // 4:] * 1_000_000_000])
+    mixed_list = mixed.tolist()
+
+    start = time.perf_counter()
+    for ts in mixed_list:
+        datetime.datetime.fromtimestamp(to_seconds(ts)).strftime(DEFAULT_TIME_FORMAT)
+    print("datetime.strftime:     %.3f s for %d timestamps" % (time.perf_counter() - start, n))
+
+    start = time.perf_counter()
+    for ts in mixed_list:
+        timestamp_to_str(ts)
+    print("SecondFormatter:       %.3f s for %d timestamps" % (time.perf_counter() - start, n))
+
+    start = time.perf_counter()
+    converted = to_datetime64(mixed)
+    print("to_datetime64 (mixed): %.3f s for %d timestamps" % (time.perf_counter() - start, n))
+    assert (converted.astype(np.int64) == seconds * 1_000_000_000).all()